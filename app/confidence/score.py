@@ -49,3 +49,15 @@ class ConfidenceScorer:
             pass
 
         return round(min(max(score, 0.0), 1.0), 2)
+
+    def escalation_score(self, data: Dict[str, Any], validation_result: Dict[str, Any]) -> float:
+        """
+        Extraction score for deciding on OCR escalation: only what could be checked counts.
+        Without subtotal / total the math weight is left out instead of scored as 0, and OCR
+        quality is left to the adaptive OCR's own page / line confidence checks - a re-run
+        can't add a subtotal the invoice doesn't have.
+        """
+        score = self.calculate(data, validation_result)
+        if data.get("subtotal") is None or data.get("total") is None:
+            score /= 1.0 - self.weights["math_check"]
+        return round(min(score, 1.0), 2)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from .db import Base
 
@@ -27,3 +27,70 @@ class Invoice(Base):
     confidence_score = Column(Float, default=0.0)
     text_hash = Column(String, unique=True, index=True) # For duplicate detection
     validation_status = Column(String, default="PENDING") # VALID, INVALID, PENDING
+
+    # Inline duplicate invoice number check (unique_per rule)
+    __table_args__ = (Index("ix_invoices_vendor_invoice_number", "vendor_name", "invoice_number"),)
+
+class InvoiceText(Base):
+    __tablename__ = "invoice_texts"
+
+    # Merged OCR text (TextCleaner.merge_lines, one line per row), source for full-text search.
+    # Kept out of invoices so listing queries don't drag the text along.
+    invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="CASCADE"), primary_key=True)
+    content = Column(Text, nullable=False, default="")
+
+class VendorTemplate(Base):
+    __tablename__ = "vendor_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    vendor_name = Column(String, unique=True, index=True)
+
+    # Field -> {"page": 1 | -1, "region": [x0, y0, x1, y1], "patterns": [regex, ...]}
+    # Regions are relative to the page extents (0.0 - 1.0)
+    fields = Column(JSON, nullable=False, default=dict)
+
+    # Number of high-confidence invoices the template was learned from
+    samples = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    # Written in the same transaction as the change it describes; delivered later by the
+    # webhook dispatcher / SSE stream in id order
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, index=True)  # invoice.created, invoice.validation_changed
+    invoice_id = Column(Integer, index=True, nullable=True)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class WebhookCursor(Base):
+    __tablename__ = "webhook_cursors"
+
+    # Last outbox event id delivered to each webhook URL
+    url = Column(String, primary_key=True)
+    last_event_id = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ValidationResult(Base):
+    __tablename__ = "validation_results"
+
+    # Failed rules from the last bulk validation run (app.validation.bulk); replaced on every run
+    id = Column(Integer, primary_key=True, index=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="CASCADE"), index=True)
+    rule = Column(String, index=True)
+    severity = Column(String)  # error, warning
+    message = Column(String)
+    checked_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class VendorStats(Base):
+    __tablename__ = "vendor_stats"
+
+    # Precomputed per-vendor totals, used by the vendor range rule
+    vendor_name = Column(String, primary_key=True)
+    samples = Column(Integer, default=0)
+    mean_total = Column(Float)
+    std_total = Column(Float)
+    min_total = Column(Float)
+    max_total = Column(Float)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
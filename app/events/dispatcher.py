@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import random
+import time
+import urllib.request
+import urllib.error
+from typing import List, Dict, Any
+
+from app.database import models
+from app.events.outbox import OutboxNotifier, fetch_events, fetch_events_by_id
+
+
+class WebhookDispatcher:
+    """
+    Delivers outbox events to webhook URLs in batches, in id order, at least once.
+
+    Each endpoint has its own cursor (webhook_cursors) and its own delivery loop, so a slow or
+    failing endpoint never holds up the others. Up to `concurrency` batches are in flight per
+    endpoint; the cursor only advances over the contiguous prefix of batches that succeeded,
+    and everything after a failure is retried with capped exponential backoff.
+
+    Receivers get POST {"events": [...]} and should de-duplicate on event id.
+
+    Ids are assigned when a transaction inserts, not when it commits, so on databases with
+    concurrent writers (Postgres) a lower id can become visible after the cursor has moved
+    past it. Ids skipped over are remembered as gaps and re-checked for `gap_timeout`
+    seconds (ids from rolled back transactions never show up); late events are delivered out
+    of order. Gaps live in memory only, so a restart within the window can still miss one.
+    """
+
+    def __init__(self, session_factory, urls: List[str], notifier: OutboxNotifier = None, batch_size: int = 100, concurrency: int = 2,
+                 timeout: float = 10.0, poll_interval: float = 1.0, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 gap_timeout: float = 60.0, max_gaps: int = 1000):
+        self.session_factory = session_factory
+        self.urls = urls
+        self.notifier = notifier or OutboxNotifier()
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+
+        self.stats = {url: {"delivered": 0, "failures": 0, "last_error": None} for url in urls}
+        self._tasks = []
+
+    @classmethod
+    def from_env(cls, session_factory, notifier: OutboxNotifier = None):
+        """WEBHOOK_URLS (comma separated), WEBHOOK_BATCH_SIZE, WEBHOOK_CONCURRENCY."""
+        urls = [u.strip() for u in os.getenv("WEBHOOK_URLS", "").split(",") if u.strip()]
+        return cls(
+            session_factory,
+            urls,
+            notifier,
+            batch_size=int(os.getenv("WEBHOOK_BATCH_SIZE", "100")),
+            concurrency=int(os.getenv("WEBHOOK_CONCURRENCY", "2")),
+        )
+
+    # --- Cursor / outbox access (sync, run in threads) ---
+
+    def _load_cursor(self, url: str) -> int:
+        session = self.session_factory()
+        try:
+            cursor = session.get(models.WebhookCursor, url)
+            if cursor is None:
+                # New endpoints start from "now", not from the beginning of history
+                latest = session.query(models.OutboxEvent.id).order_by(models.OutboxEvent.id.desc()).first()
+                cursor = models.WebhookCursor(url=url, last_event_id=latest[0] if latest else 0)
+                session.add(cursor)
+                session.commit()
+            return cursor.last_event_id
+        finally:
+            session.close()
+
+    def _save_cursor(self, url: str, last_event_id: int):
+        session = self.session_factory()
+        try:
+            session.merge(models.WebhookCursor(url=url, last_event_id=last_event_id))
+            session.commit()
+        finally:
+            session.close()
+
+    def _fetch(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        session = self.session_factory()
+        try:
+            return fetch_events(session, after_id, limit)
+        finally:
+            session.close()
+
+    def _fetch_ids(self, ids: List[int]) -> List[Dict[str, Any]]:
+        session = self.session_factory()
+        try:
+            return fetch_events_by_id(session, ids)
+        finally:
+            session.close()
+
+    def _post(self, url: str, batch: List[Dict[str, Any]]):
+        body = json.dumps({"events": batch}, default=str).encode()
+        request = urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise urllib.error.HTTPError(url, response.status, "Webhook rejected batch", response.headers, None)
+
+    # --- Delivery loop ---
+
+    async def _deliver(self, url: str, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            await asyncio.to_thread(self._post, url, batch)
+            return True
+        except Exception as e:
+            self.stats[url]["failures"] += 1
+            self.stats[url]["last_error"] = str(e)
+            return False
+
+    def _track_gaps(self, gaps: Dict[int, float], cursor: int, batch: List[Dict[str, Any]]):
+        """Remember ids skipped between the cursor and the events of a delivered batch."""
+        now = time.monotonic()
+        expected = cursor + 1
+        for event in batch:
+            for missing in range(expected, event["id"]):
+                gaps[missing] = now
+            expected = event["id"] + 1
+        while len(gaps) > self.max_gaps:
+            gaps.pop(min(gaps, key=gaps.get))
+
+    async def _run_endpoint(self, url: str):
+        cursor = await asyncio.to_thread(self._load_cursor, url)
+        failures = 0
+        gaps: Dict[int, float] = {}  # event id -> when it was skipped
+
+        while True:
+            seen = self.notifier.version
+            expired = [i for i, since in gaps.items() if time.monotonic() - since > self.gap_timeout]
+            for i in expired:
+                del gaps[i]
+            late = await asyncio.to_thread(self._fetch_ids, sorted(gaps)) if gaps else []
+            events = await asyncio.to_thread(self._fetch, cursor, self.batch_size * self.concurrency)
+            if not events and not late:
+                await self.notifier.wait(self.poll_interval, seen)
+                continue
+
+            results = []
+            if late:
+                ok = await self._deliver(url, late)
+                results.append(ok)
+                if ok:
+                    for event in late:
+                        gaps.pop(event["id"], None)
+                    self.stats[url]["delivered"] += len(late)
+
+            batches = [events[i:i + self.batch_size] for i in range(0, len(events), self.batch_size)]
+            batch_results = await asyncio.gather(*(self._deliver(url, batch) for batch in batches))
+            results.extend(batch_results)
+
+            delivered = 0
+            for batch, ok in zip(batches, batch_results):
+                if not ok:
+                    break
+                self._track_gaps(gaps, cursor, batch)
+                cursor = batch[-1]["id"]
+                delivered += len(batch)
+
+            if delivered:
+                await asyncio.to_thread(self._save_cursor, url, cursor)
+                self.stats[url]["delivered"] += delivered
+
+            if all(results):
+                failures = 0
+            else:
+                failures += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    def start(self):
+        """Start one delivery task per endpoint on the running event loop."""
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._run_endpoint(url)) for url in self.urls]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database import models
+
+INVOICE_CREATED = "invoice.created"
+VALIDATION_CHANGED = "invoice.validation_changed"
+
+PAYLOAD_FIELDS = [
+    "id", "filename", "vendor_name", "invoice_number", "invoice_date", "currency",
+    "subtotal", "tax", "total", "line_items", "confidence_score", "validation_status",
+]
+
+
+def invoice_payload(invoice: models.Invoice) -> Dict[str, Any]:
+    return {field: getattr(invoice, field) for field in PAYLOAD_FIELDS}
+
+
+def record_event(session: Session, event_type: str, invoice: models.Invoice, **extra) -> models.OutboxEvent:
+    """
+    Add an outbox event to the session. Must be called before the commit of the change it
+    describes, so the event exists if and only if the change does. The invoice needs an id (flush first).
+    """
+    payload = invoice_payload(invoice)
+    payload.update(extra)
+    event = models.OutboxEvent(event_type=event_type, invoice_id=invoice.id, payload=payload)
+    session.add(event)
+    return event
+
+
+def fetch_events(session: Session, after_id: int, limit: int) -> List[Dict[str, Any]]:
+    rows = (
+        session.query(models.OutboxEvent)
+        .filter(models.OutboxEvent.id > after_id)
+        .order_by(models.OutboxEvent.id)
+        .limit(limit)
+        .all()
+    )
+    return [event_dict(row) for row in rows]
+
+
+def fetch_events_by_id(session: Session, ids: List[int]) -> List[Dict[str, Any]]:
+    rows = session.query(models.OutboxEvent).filter(models.OutboxEvent.id.in_(ids)).order_by(models.OutboxEvent.id).all()
+    return [event_dict(row) for row in rows]
+
+
+def event_dict(event: models.OutboxEvent) -> Dict[str, Any]:
+    return {
+        "id": event.id,
+        "type": event.event_type,
+        "invoice_id": event.invoice_id,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+        "data": event.payload,
+    }
+
+
+class OutboxNotifier:
+    """
+    Wakes outbox consumers (webhook dispatcher, SSE streams) right after a commit, instead of
+    waiting for their next poll. notify() never blocks and is safe to call from any thread.
+    Consumers in other processes just rely on polling.
+
+    Consumers read `version` before fetching and pass it to wait(), so a notify() that lands
+    between their fetch and their wait is not lost.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._waiters = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _wake(self):
+        for waiter in list(self._waiters):
+            waiter.set()
+
+    def notify(self):
+        with self._lock:
+            self.version += 1
+            loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wake()
+        else:
+            loop.call_soon_threadsafe(self._wake)
+
+    async def wait(self, timeout: float, seen_version: int) -> bool:
+        """Wait until notified after seen_version, or the timeout. Returns True if notified."""
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            if self.version != seen_version:
+                return True
+            waiter = asyncio.Event()
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.discard(waiter)
@@ -1,24 +1,129 @@
+import json
+import os
 import re
-from typing import List
+from typing import List, Dict, Optional, Tuple
+
+# URLs and e-mail addresses are full of letter runs that look like codes ("usd" in a domain)
+NOISE = re.compile(r"(?:https?://|www\.)\S+|\S+@\S+\.\S+", re.IGNORECASE)
+AMOUNT = re.compile(r"\d[\d,]*(?:\.\d+)?")
+TOTAL_KEYWORDS = ("total", "amount due", "balance due", "amount payable")
+
+# Used when data/currencies.json is missing
+FALLBACK_TABLE = {
+    "codes": ["USD", "EUR", "GBP", "JPY", "CAD", "AUD"],
+    "symbols": {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY"},
+    "ambiguous": {"$": ["USD", "CAD", "AUD"], "¥": ["JPY"]},
+}
+
 
 class CurrencyExtractor:
-    def __init__(self):
-        self.currency_map = {
-            "$": "USD",
-            "€": "EUR",
-            "£": "GBP",
-            "¥": "JPY",
-            "USD": "USD",
-            "EUR": "EUR",
-            "GBP": "GBP",
-            "CAD": "CAD",
-            "AUD": "AUD"
-        }
-
-    def extract(self, lines: List[str]) -> str:
-        # Scan for currency codes first
+    """
+    Detects the invoice currency from ISO 4217 codes and currency symbols.
+
+    Every line is scanned once by a single compiled pattern: symbols (longest first, so "NZ$"
+    wins over "$") or any standalone 3-letter uppercase token, which is then looked up in the
+    code set - so the scan costs the same whatever the size of the table.
+
+    Candidates are weighted by how close they sit to an amount, with a boost on total lines
+    (or lines holding one of the given amounts). Codes that double as words ("ALL", "PEN",
+    "TOP" - the table's word_codes) only count right next to an amount on a total line.
+    Ambiguous symbols ("$", "¥", "kr") back the strongest explicit code they could stand for,
+    else their default.
+    """
+
+    def __init__(self, currencies_file_path: str = "data/currencies.json", min_confidence: float = 0.2, ambiguous_weight: float = 0.8):
+        table = FALLBACK_TABLE
+        if os.path.exists(currencies_file_path):
+            with open(currencies_file_path, 'r', encoding='utf-8') as f:
+                table = json.load(f)
+
+        self.codes = frozenset(table["codes"])
+        self.symbols: Dict[str, str] = table["symbols"]
+        self.ambiguous: Dict[str, List[str]] = table.get("ambiguous", {})
+        self.word_codes = frozenset(table.get("word_codes", []))
+        self.min_confidence = min_confidence
+        self.ambiguous_weight = ambiguous_weight
+
+        alternatives = []
+        for symbol in sorted(self.symbols, key=len, reverse=True):
+            pattern = re.escape(symbol)
+            # Letter symbols ("kr", "RM", "CHF") must stand alone, not sit inside a word
+            if symbol[0].isalpha():
+                pattern = r"(?<![A-Za-z])" + pattern
+            if symbol[-1].isalpha():
+                pattern += r"(?![A-Za-z])"
+            alternatives.append(pattern)
+        self.matcher = re.compile(r"(?P<symbol>" + "|".join(alternatives) + r")|(?<![A-Za-z])(?P<code>[A-Z]{3})(?![A-Za-z])")
+
+    def _parse_amount(self, text: str) -> Optional[float]:
+        try:
+            return float(text.replace(',', ''))
+        except ValueError:
+            return None
+
+    def _proximity(self, match, amount_spans: List[Tuple[int, int]]) -> float:
+        if not amount_spans:
+            return 0.1
+        gap = min(max(start - match.end(), match.start() - end, 0) for start, end in amount_spans)
+        if gap <= 1:
+            return 1.0  # "$110.00", "110.00 EUR"
+        if gap <= 10:
+            return 0.6  # "EUR Total 110.00"
+        return 0.3
+
+    def detect(self, lines: List[str], amounts: List[float] = None) -> Tuple[Optional[str], float]:
+        """
+        Returns (currency code, confidence 0.0 - 1.0), or (None, 0.0) if nothing was found.
+        amounts: already extracted values (e.g. subtotal / tax / total); lines holding them count more.
+        """
+        amounts = [a for a in amounts or [] if a is not None]
+        scores: Dict[str, float] = {}
+        ambiguous_votes = []
+
         for line in lines:
-            for symbol, code in self.currency_map.items():
-                if symbol in line:
-                    return code
-        return "USD" # Default fallback
+            line = NOISE.sub(" ", line)
+            matches = list(self.matcher.finditer(line))
+            if not matches:
+                continue
+
+            tokens = list(AMOUNT.finditer(line))
+            values = [self._parse_amount(t.group()) for t in tokens]
+            is_total = any(k in line.lower() for k in TOTAL_KEYWORDS) or any(
+                v is not None and abs(v - a) < 0.005 for v in values for a in amounts
+            )
+            spans = [t.span() for t in tokens]
+
+            for match in matches:
+                proximity = self._proximity(match, spans)
+                weight = proximity * (1.5 if is_total else 1.0)
+                symbol = match.group("symbol")
+                if symbol is None:
+                    code = match.group("code")
+                    if code not in self.codes:
+                        continue
+                    if code in self.word_codes and not (is_total and proximity == 1.0):
+                        continue  # "ALL ITEMS 25.00", "BLUE PEN 2.50"
+                elif symbol in self.ambiguous:
+                    ambiguous_votes.append((symbol, weight))
+                    continue
+                else:
+                    code = self.symbols[symbol]
+                scores[code] = scores.get(code, 0.0) + weight
+
+        explicit = dict(scores)
+        for symbol, weight in ambiguous_votes:
+            family = [c for c in self.ambiguous[symbol] if c in explicit]
+            code = max(family, key=explicit.get) if family else self.symbols[symbol]
+            scores[code] = scores.get(code, 0.0) + weight * self.ambiguous_weight
+
+        if not scores:
+            return None, 0.0
+        best = max(scores, key=scores.get)
+        # Share of the evidence, scaled down when the evidence itself is thin
+        confidence = scores[best] / sum(scores.values()) * min(1.0, scores[best])
+        return best, round(confidence, 2)
+
+    def extract(self, lines: List[str], amounts: List[float] = None) -> Optional[str]:
+        """Best currency code, or None when the evidence is below min_confidence (no silent default)."""
+        code, confidence = self.detect(lines, amounts)
+        return code if confidence >= self.min_confidence else None
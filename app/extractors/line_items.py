@@ -1,11 +1,24 @@
-from typing import List, Dict
+from typing import List, Dict, Union
 import re
 
+from app.ocr.document import OCRDocument
+
 class LineItemExtractor:
     def __init__(self):
         pass
 
-    def extract(self, raw_lines_with_box: List[Dict]) -> List[Dict]:
+    def _lines_by_y(self, raw_lines_with_box: Union[List[Dict], OCRDocument]):
+        """(text, bottom_y) pairs sorted by top Y, from either dict lines or an OCRDocument."""
+        if isinstance(raw_lines_with_box, OCRDocument):
+            doc = raw_lines_with_box
+            order = doc.boxes[:, 0, 1].argsort(kind="stable")
+            bottoms = doc.boxes[order, 2, 1].tolist()
+            return ((doc.text(i), bottom) for i, bottom in zip(order.tolist(), bottoms))
+
+        sorted_lines = sorted(raw_lines_with_box, key=lambda x: x['box'][0][1]) # Sort by Y
+        return ((line['text'], line['box'][2][1]) for line in sorted_lines)
+
+    def extract(self, raw_lines_with_box: Union[List[Dict], OCRDocument]) -> List[Dict]:
         """
         Extract line items based on strictly aligned columns.
         Guardrails:
@@ -23,10 +36,8 @@ class LineItemExtractor:
         header_y = None
         column_x_ranges = {}
         
-        sorted_lines = sorted(raw_lines_with_box, key=lambda x: x['box'][0][1]) # Sort by Y
-        
-        for line in sorted_lines:
-            text = line['text'].lower()
+        for line_text, bottom_y in self._lines_by_y(raw_lines_with_box):
+            text = line_text.lower()
             current_x_ranges = {}
             found_headers = 0
             
@@ -48,7 +59,7 @@ class LineItemExtractor:
                     matches += 1
             
             if matches >= 3: # Found a likely header row
-                header_y = line['box'][2][1] # Bottom Y of header
+                header_y = bottom_y # Bottom Y of header
                 # We can't define column X ranges easily without word-level boxes.
                 # Project constraint: "PaddleOCR (lightweight CPU model)" typically returns line boxes.
                 # If we assume meaningful whitespace separation in the text string, we can try to split.
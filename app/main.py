@@ -1,13 +1,20 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+from typing import Optional, List
+import asyncio
 import shutil
 import hashlib
+import hmac
+import json
 import os
+import time
 
 from app.database import models, db
-from app.schemas import InvoiceResponse, InvoiceCreate, LineItem
-from app.ocr.paddle import PaddleOCRAdapter
+from app.schemas import InvoiceResponse, InvoiceCreate, LineItem, SearchHit
+from app.ocr.adaptive import AdaptiveOCRAdapter
 from app.preprocessing.cleaner import TextCleaner
 from app.extractors.vendor import VendorExtractor
 from app.extractors.invoice_number import InvoiceNumberExtractor
@@ -16,13 +23,30 @@ from app.extractors.currency import CurrencyExtractor
 from app.extractors.totals import TotalsExtractor
 from app.extractors.line_items import LineItemExtractor
 from app.validation.validator import Validator
+from app.validation.stats import VendorStatsCache
 from app.confidence.score import ConfidenceScorer
+from app.templates.store import TemplateStore
+from app.templates.learner import TemplateLearner
+from app.search.index import get_search_backend, save_invoice_text
+from app.scheduling.scheduler import ScanScheduler, PRIORITIES, INTERACTIVE, tenant_id
+from app.events.outbox import OutboxNotifier, record_event, fetch_events, INVOICE_CREATED
+from app.events.dispatcher import WebhookDispatcher
+from app.profiling.profiler import Profiler
+from app.pipeline.incremental import IncrementalScan
+
+@asynccontextmanager
+async def lifespan(app):
+    # Only one process delivers webhooks (worker slot 0 under app.server), the rest just write the outbox
+    if webhook_dispatcher.urls and os.getenv("SMARTSCAN_WORKER_SLOT", "0") == "0":
+        webhook_dispatcher.start()
+    yield
+    await webhook_dispatcher.stop()
 
 # Initialize Core Components
-app = FastAPI(title="Smart Scan API")
-ocr_engine = PaddleOCRAdapter()
+app = FastAPI(title="Smart Scan API", lifespan=lifespan)
+ocr_engine = AdaptiveOCRAdapter()
 cleaner = TextCleaner()
-validator = Validator()
+validator = Validator(vendor_stats=VendorStatsCache(db.SessionLocal))
 scorer = ConfidenceScorer()
 
 # Extractors
@@ -33,8 +57,29 @@ currency_ex = CurrencyExtractor()
 totals_ex = TotalsExtractor()
 line_item_ex = LineItemExtractor()
 
+# Vendor Templates
+template_store = TemplateStore()
+template_learner = TemplateLearner()
+
+# OCR Scheduling (priority classes + per-tenant fair queuing)
+scheduler = ScanScheduler()
+
+# Profiling (stage timings for every scan, sampled stacks + memory snapshots on request)
+profiler = Profiler()
+
 # Database
 models.Base.metadata.create_all(bind=db.engine)
+# create_all skips existing tables, indexes included
+for index in models.Invoice.__table__.indexes:
+    index.create(bind=db.engine, checkfirst=True)
+
+# Event Streaming (outbox -> webhooks / SSE)
+outbox_notifier = OutboxNotifier()
+webhook_dispatcher = WebhookDispatcher.from_env(db.SessionLocal, outbox_notifier)
+
+# Full-text search index over the merged invoice text
+search_backend = get_search_backend(db.engine)
+search_backend.setup(db.engine)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,9 +91,107 @@ app.add_middleware(
 
 MAX_FILE_SIZE = 10 * 1024 * 1024 # 10 MB
 
-@app.post("/scan", response_model=InvoiceResponse)
-async def scan_invoice(file: UploadFile = File(...), db_session: Session = Depends(db.get_db)):
-    # 1. File Validation
+def score_ocr_pass(raw_lines):
+    """Quick generic extraction + scoring of a candidate OCR pass, used to decide on OCR escalation."""
+    merged_lines = cleaner.merge_lines(raw_lines)
+    data = {
+        "vendor_name": vendor_ex.extract(merged_lines),
+        "invoice_number": inv_num_ex.extract(merged_lines),
+        "invoice_date": date_ex.extract(merged_lines),
+    }
+    data.update(totals_ex.extract(merged_lines))
+    data["currency"] = currency_ex.extract(merged_lines, amounts=[data["subtotal"], data["tax"], data["total"]])
+    return scorer.escalation_score(data, validator.validate(data))
+
+def extract_fields(db_session: Session, all_raw_lines, merged_lines):
+    """Step 4 of the scan pipeline: field extraction over the whole document."""
+    extracted_data = {}
+    extracted_data["vendor_name"] = vendor_ex.extract(merged_lines)
+
+    # Known vendors: region lookups from the learned template, generic heuristics for anything it misses
+    template = template_store.get(db_session, extracted_data["vendor_name"])
+    templated = template.apply(all_raw_lines) if template else {}
+
+    extracted_data["invoice_number"] = templated.get("invoice_number") or inv_num_ex.extract(merged_lines)
+    extracted_data["invoice_date"] = templated.get("invoice_date") or date_ex.extract(merged_lines)
+    
+    if all(f in templated for f in ("subtotal", "tax", "total")):
+        totals = {f: templated[f] for f in ("subtotal", "tax", "total")}
+    else:
+        totals = totals_ex.extract(merged_lines)
+        totals.update({f: v for f, v in templated.items() if f in totals})
+    extracted_data.update(totals)
+
+    # Currency is ranked by proximity to the amounts, so it comes after totals
+    extracted_data["currency"] = currency_ex.extract(merged_lines, amounts=list(totals.values()))
+    
+    # Line Items (Best Effort / Guardrailed)
+    # Pass raw lines with boxes to line item extractor
+    extracted_data["line_items"] = line_item_ex.extract(all_raw_lines) 
+    return extracted_data
+
+def finalize_invoice(db_session: Session, filename: str, text_hash: str, extracted_data, all_raw_lines, merged_lines, profile):
+    """Steps 5-7 of the scan pipeline: validate, score and persist extracted fields."""
+    # 5. Validation
+    # 6. Confidence Scoring
+    with profile.stage("validate"):
+        validation_res = validator.validate(extracted_data, session=db_session)
+        confidence = scorer.calculate(extracted_data, validation_res)
+        extracted_data["confidence_score"] = confidence
+
+    # 7. Persistence
+    with profile.stage("persist"):
+        db_invoice = models.Invoice(
+            filename=filename,
+            text_hash=text_hash,
+            vendor_name=extracted_data["vendor_name"],
+            invoice_number=extracted_data["invoice_number"],
+            invoice_date=extracted_data["invoice_date"],
+            currency=extracted_data["currency"],
+            subtotal=extracted_data["subtotal"],
+            tax=extracted_data["tax"],
+            total=extracted_data["total"],
+            line_items=extracted_data["line_items"], # SQLAlchemy JSON type handles list of dicts
+            confidence_score=confidence,
+            validation_status="VALID" if validation_res["is_valid"] else "INVALID"
+        )
+        
+        db_session.add(db_invoice)
+        db_session.flush()
+        save_invoice_text(db_session, db_invoice.id, merged_lines)
+        record_event(db_session, INVOICE_CREATED, db_invoice)
+        template_learned = template_learner.learn(db_session, extracted_data["vendor_name"], all_raw_lines, extracted_data, confidence)
+        db_session.commit()
+        db_session.refresh(db_invoice)
+    outbox_notifier.notify()
+
+    if template_learned:
+        template_store.invalidate(extracted_data["vendor_name"])
+
+    return db_invoice
+
+def extract_and_persist(db_session: Session, filename: str, text_hash: str, raw_results, profile):
+    """Steps 3-7 of the scan pipeline: merge, extract, validate, score and persist OCR output."""
+    # Columnar OCRDocument: merging, line items, template lookups and learning all read the arrays directly
+    all_raw_lines = raw_results
+    
+    # 3. Preprocessing
+    # Merge lines mainly for field extraction (reading order)
+    with profile.stage("merge"):
+        merged_lines = cleaner.merge_lines(all_raw_lines)
+    
+    # 4. Extraction
+    with profile.stage("extract"):
+        extracted_data = extract_fields(db_session, all_raw_lines, merged_lines)
+
+    return finalize_invoice(db_session, filename, text_hash, extracted_data, all_raw_lines, merged_lines, profile)
+
+
+async def read_upload(file: UploadFile, x_scan_priority: str) -> bytes:
+    """Step 1 of the scan pipeline: request validation. Returns the file content."""
+    if x_scan_priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid priority. Use one of: {', '.join(PRIORITIES)}.")
+
     if file.content_type not in ["application/pdf", "image/png", "image/jpeg", "image/jpg"]:
         raise HTTPException(status_code=400, detail="Invalid file type. Only PDF, PNG, JPEG allowed.")
     
@@ -59,7 +202,32 @@ async def scan_invoice(file: UploadFile = File(...), db_session: Session = Depen
     if size > MAX_FILE_SIZE:
         raise HTTPException(status_code=400, detail="File too large. Max 10MB.")
         
-    content = await file.read()
+    return await file.read()
+
+
+def is_admin(x_admin_token: Optional[str]) -> bool:
+    # Closed unless ADMIN_TOKEN is configured
+    token = os.getenv("ADMIN_TOKEN")
+    return bool(token) and hmac.compare_digest((x_admin_token or "").encode(), token.encode())
+
+
+def profile_requested(x_profile: Optional[str], x_admin_token: Optional[str]) -> bool:
+    # Profiling slows the scan down, so only admins may ask for it (same rule as the /admin endpoints)
+    return x_profile is not None and x_profile.lower() in ("1", "true", "yes") and is_admin(x_admin_token)
+
+
+@app.post("/scan", response_model=InvoiceResponse)
+async def scan_invoice(
+    response: Response,
+    file: UploadFile = File(...),
+    db_session: Session = Depends(db.get_db),
+    x_api_key: Optional[str] = Header(None),
+    x_scan_priority: str = Header(INTERACTIVE),
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+):
+    # 1. File Validation
+    content = await read_upload(file, x_scan_priority)
     
     # Text Hash for deduplication
     text_hash = hashlib.sha256(content).hexdigest()
@@ -69,60 +237,267 @@ async def scan_invoice(file: UploadFile = File(...), db_session: Session = Depen
     if existing:
         return existing
 
+    profile = profiler.begin(file.filename, requested=profile_requested(x_profile, x_admin_token))
+    response.headers["X-Scan-Job-Id"] = profile.job_id
+
     # 2. OCR
+    def run_ocr(*args, **kwargs):
+        # Runs in the scheduler's worker thread; the stage attaches that thread to the sampler
+        with profile.stage("ocr"):
+            return ocr_engine.process_document(*args, **kwargs)
+
+    queued_at = time.perf_counter()
+    # Finished on every way out, including a client disconnect cancelling the request:
+    # a sampled profile left open keeps tracemalloc on and holds a PROFILE_MAX_ACTIVE slot
+    invoice_id, error = None, "cancelled"
     try:
-        # OCR returns list of pages, each page list of lines with boxes
-        raw_results = ocr_engine.process_file(content, file.filename)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OCR Failed: {str(e)}")
-
-    # Flatten results for global field extraction (Vendor, Date, etc)
-    # But keep structure for Line Items if needed
-    all_raw_lines = raw_results # List of dicts
-    
-    # 3. Preprocessing
-    # Merge lines mainly for field extraction (reading order)
-    merged_lines = cleaner.merge_lines(all_raw_lines)
-    
-    # 4. Extraction
-    extracted_data = {}
-    extracted_data["vendor_name"] = vendor_ex.extract(merged_lines)
-    extracted_data["invoice_number"] = inv_num_ex.extract(merged_lines)
-    extracted_data["invoice_date"] = date_ex.extract(merged_lines)
-    extracted_data["currency"] = currency_ex.extract(merged_lines)
-    
-    totals = totals_ex.extract(merged_lines)
-    extracted_data.update(totals)
-    
-    # Line Items (Best Effort / Guardrailed)
-    # Pass raw lines with boxes to line item extractor
-    extracted_data["line_items"] = line_item_ex.extract(all_raw_lines) 
+        try:
+            # OCR returns an OCRDocument (all pages, lines with boxes)
+            # Queued behind the scheduler and run off the event loop
+            raw_results = await scheduler.run(tenant_id(x_api_key), x_scan_priority, run_ocr, content, file.filename, evaluate=score_ocr_pass)
+        except Exception as e:
+            error = f"OCR Failed: {str(e)}"
+            raise HTTPException(status_code=500, detail=error)
+        ocr_seconds = sum(st["seconds"] for st in profile.stages if st["name"] == "ocr")
+        profile.record("queue_wait", time.perf_counter() - queued_at - ocr_seconds)
 
-    # 5. Validation
-    validation_res = validator.validate(extracted_data)
-    
-    # 6. Confidence Scoring
-    confidence = scorer.calculate(extracted_data, validation_res)
-    extracted_data["confidence_score"] = confidence
+        try:
+            # Extraction, validation and the commit are CPU/IO-bound too; keep them off the event loop
+            db_invoice = await asyncio.to_thread(extract_and_persist, db_session, file.filename, text_hash, raw_results, profile)
+        except Exception as e:
+            error = str(e)
+            raise
 
-    # 7. Persistence
-    db_invoice = models.Invoice(
-        filename=file.filename,
-        text_hash=text_hash,
-        vendor_name=extracted_data["vendor_name"],
-        invoice_number=extracted_data["invoice_number"],
-        invoice_date=extracted_data["invoice_date"],
-        currency=extracted_data["currency"],
-        subtotal=extracted_data["subtotal"],
-        tax=extracted_data["tax"],
-        total=extracted_data["total"],
-        line_items=extracted_data["line_items"], # SQLAlchemy JSON type handles list of dicts
-        confidence_score=confidence,
-        validation_status="VALID" if validation_res["is_valid"] else "INVALID"
-    )
-    
-    db_session.add(db_invoice)
-    db_session.commit()
-    db_session.refresh(db_invoice)
-    
-    return db_invoice
+        invoice_id, error = db_invoice.id, None
+        return db_invoice
+    finally:
+        profiler.finish(profile, invoice_id=invoice_id, error=error)
+
+
+@app.post("/scan/stream")
+async def scan_invoice_stream(
+    file: UploadFile = File(...),
+    line_items: bool = Query(False),
+    x_api_key: Optional[str] = Header(None),
+    x_scan_priority: str = Header(INTERACTIVE),
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Page-incremental /scan, streamed as NDJSON. Header fields are sent as soon as page 1 is
+    read, totals after the last page; middle pages are only OCRed when line_items is set or a
+    field is still missing. The last event ("invoice") carries the persisted invoice.
+
+    Before persisting, the skipped pages are OCRed too, so the stored text (search) and line
+    items cover every page, as with /scan. Unlike /scan, fields are taken from the first page
+    they turn up on (header from page 1, totals from the last page) rather than from the
+    document as a whole, and the "invoice" event arrives after the full OCR.
+    """
+    content = await read_upload(file, x_scan_priority)
+    text_hash = hashlib.sha256(content).hexdigest()
+    filename = file.filename
+    tenant = tenant_id(x_api_key)
+
+    try:
+        page_count = await asyncio.to_thread(ocr_engine.page_count, content, filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def line(event):
+        return json.dumps(event, default=str) + "\n"
+
+    def invoice_event(db_invoice, profile=None):
+        event = {"event": "invoice", "invoice": InvoiceResponse.model_validate(db_invoice).model_dump(mode="json")}
+        if profile is not None:
+            event["job_id"] = profile.job_id
+        return line(event)
+
+    async def events():
+        db_session = db.SessionLocal()
+        try:
+            existing = db_session.query(models.Invoice).filter(models.Invoice.text_hash == text_hash).first()
+            if existing:
+                yield invoice_event(existing)
+                return
+
+            profile = profiler.begin(filename, requested=profile_requested(x_profile, x_admin_token))
+
+            def run_ocr(pages):
+                with profile.stage("ocr"):
+                    return ocr_engine.process_document(content, filename, pages=pages)
+
+            async def read_pages(pages):
+                # One scheduler slot per step, so a long statement doesn't hold the OCR engine throughout
+                return await scheduler.run(tenant, x_scan_priority, run_ocr, pages)
+
+            scan = IncrementalScan(
+                cleaner,
+                {
+                    "vendor_name": vendor_ex,
+                    "invoice_number": inv_num_ex,
+                    "invoice_date": date_ex,
+                    "currency": currency_ex,
+                    "totals": totals_ex,
+                    "line_items": line_item_ex,
+                },
+                template_lookup=lambda vendor: template_store.get(db_session, vendor),
+            )
+            # A client disconnect cancels or closes this generator (CancelledError / GeneratorExit),
+            # which "except Exception" doesn't see; the profile is finished either way
+            invoice_id, error = None, "cancelled"
+            try:
+                async for event in scan.run(read_pages, page_count, line_items=line_items):
+                    yield line(event)
+
+                await scan.read_remaining(read_pages)
+                db_invoice = await asyncio.to_thread(
+                    finalize_invoice, db_session, filename, text_hash, scan.data, scan.raw_lines, scan.merged_lines, profile
+                )
+                invoice_id, error = db_invoice.id, None
+            except Exception as e:
+                error = str(e)
+                yield line({"event": "error", "detail": str(e)})
+                return
+            finally:
+                profiler.finish(profile, invoice_id=invoice_id, error=error)
+
+            yield invoice_event(db_invoice, profile)
+        finally:
+            db_session.close()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics/scheduler")
+def scheduler_metrics():
+    return scheduler.metrics()
+
+
+@app.get("/metrics/ocr")
+def ocr_metrics():
+    return ocr_engine.stats.snapshot()
+
+
+@app.get("/search", response_model=List[SearchHit])
+def search_invoices(
+    q: str,
+    vendor: Optional[str] = None,
+    currency: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db_session: Session = Depends(db.get_db),
+):
+    """Words in q must all appear; "quoted text" and hyphenated words (INV-2023-001) match as phrases."""
+    filters = {
+        "vendor": vendor,
+        "currency": currency,
+        "status": status,
+        "date_from": date_from,
+        "date_to": date_to,
+        "min_total": min_total,
+        "max_total": max_total,
+    }
+    return search_backend.search(db_session, q, filters, limit=limit, offset=offset)
+
+
+@app.get("/metrics/webhooks")
+def webhook_metrics():
+    return webhook_dispatcher.stats
+
+
+def _latest_event_id() -> int:
+    session = db.SessionLocal()
+    try:
+        latest = session.query(models.OutboxEvent.id).order_by(models.OutboxEvent.id.desc()).first()
+        return latest[0] if latest else 0
+    finally:
+        session.close()
+
+
+def _fetch_outbox(after_id: int, limit: int):
+    session = db.SessionLocal()
+    try:
+        return fetch_events(session, after_id, limit)
+    finally:
+        session.close()
+
+
+@app.get("/events/stream")
+async def stream_events(request: Request, after: Optional[int] = None, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events feed of the outbox. Resumes after `after` or the Last-Event-ID header,
+    otherwise starts with new events only.
+    """
+    if after is not None:
+        cursor = after
+    elif last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+    else:
+        cursor = await asyncio.to_thread(_latest_event_id)
+
+    async def event_source():
+        nonlocal cursor
+        idle = 0.0
+        while not await request.is_disconnected():
+            seen = outbox_notifier.version
+            events = await asyncio.to_thread(_fetch_outbox, cursor, 100)
+            for event in events:
+                cursor = event["id"]
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+            if events:
+                idle = 0.0
+                continue
+
+            # Woken by commits in this process; events from other workers are picked up by polling
+            if not await outbox_notifier.wait(1.0, seen):
+                idle += 1.0
+                if idle >= 15.0:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need X-Admin-Token to match ADMIN_TOKEN; without ADMIN_TOKEN they are closed."""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+
+@app.get("/admin/scans/slowest", dependencies=[Depends(require_admin)])
+def slowest_scans(n: int = Query(10, ge=1, le=100)):
+    return profiler.slowest(n)
+
+
+@app.get("/admin/profiles/{job_id}", dependencies=[Depends(require_admin)])
+def get_profile(job_id: str):
+    if not job_id.isalnum():
+        raise HTTPException(status_code=400, detail="Invalid job id.")
+    artifact = profiler.load(job_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return artifact
+
+
+@app.get("/admin/profiles/{job_id}/flamegraph", dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+def get_profile_flamegraph(job_id: str):
+    """Collapsed stacks, ready for flamegraph.pl or speedscope."""
+    if not job_id.isalnum():
+        raise HTTPException(status_code=400, detail="Invalid job id.")
+    folded = profiler.load_folded(job_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return folded
+
+
+@app.get("/admin/invoices/{invoice_id}/profile", dependencies=[Depends(require_admin)])
+def get_invoice_profile(invoice_id: int):
+    job_id = profiler.job_for_invoice(invoice_id)
+    if job_id is None:
+        raise HTTPException(status_code=404, detail="No profile stored for this invoice.")
+    return profiler.load(job_id)
@@ -0,0 +1,218 @@
+import threading
+import time
+from typing import List, Dict, Callable, Optional
+
+import numpy as np
+from PIL import Image
+
+from app.ocr.document import OCRDocument, DocumentBuilder
+from app.ocr.paddle import PaddleOCRAdapter
+
+
+class TierStats:
+    """Thread-safe counters for how far documents had to escalate, exported at /metrics/ocr."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = {"fast": 0, "region": 0, "full": 0}  # by final tier
+        self.pages = {"fast": 0, "full": 0}                    # pages OCRed per engine
+        self.regions = 0
+        self.seconds = {"fast": 0.0, "region": 0.0, "full": 0.0}
+        self.escalations = {"score": 0, "page_confidence": 0}
+        self.scores = {"fast": [0.0, 0], "final": [0.0, 0]}  # running sum, count
+
+    def record(self, final_tier: str, pages: Dict[str, int], regions: int, seconds: Dict[str, float], reasons: List[str], fast_score: Optional[float], final_score: Optional[float]):
+        with self._lock:
+            self.documents[final_tier] += 1
+            for tier, n in pages.items():
+                self.pages[tier] += n
+            self.regions += regions
+            for tier, s in seconds.items():
+                self.seconds[tier] += s
+            for reason in reasons:
+                self.escalations[reason] += 1
+            for key, score in (("fast", fast_score), ("final", final_score)):
+                if score is not None:
+                    self.scores[key][0] += score
+                    self.scores[key][1] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            total = sum(self.documents.values())
+            return {
+                "documents": dict(self.documents),
+                "fast_tier_ratio": round(self.documents["fast"] / total, 4) if total else 0.0,
+                "pages": dict(self.pages),
+                "regions": self.regions,
+                "seconds": {k: round(v, 3) for k, v in self.seconds.items()},
+                "escalations": dict(self.escalations),
+                "avg_score": {k: round(s / n, 4) if n else 0.0 for k, (s, n) in self.scores.items()},
+            }
+
+
+class AdaptiveOCRAdapter:
+    """
+    Tiered OCR. Every document gets a cheap first pass (fast tier: lower DPI, no angle
+    classifier). Only when the result looks weak do we pay for more:
+
+    - pages whose OCR confidence is low are re-run at the full tier
+    - if the extraction score is low, low-confidence lines on the remaining pages are
+      cropped from a full-DPI render, upscaled and re-read (region tier)
+    - if the score is low and nothing is localizable, all pages are re-run at the full tier
+
+    Pages are held as OCRDocuments throughout, so no per-line dicts are built; output is in
+    fast-tier coordinates.
+    """
+
+    def __init__(self, lang='en', cpu_threads=None, score_threshold=0.8, page_threshold=0.85, line_threshold=0.8, region_upscale=2.0):
+        self.lang = lang
+        self.cpu_threads = cpu_threads
+        self.score_threshold = score_threshold
+        self.page_threshold = page_threshold
+        self.line_threshold = line_threshold
+        self.region_upscale = region_upscale
+
+        self.fast = PaddleOCRAdapter(lang, cpu_threads, tier="fast")
+        self._full = None
+        self._full_lock = threading.Lock()
+        self.stats = TierStats()
+
+    @property
+    def full(self) -> PaddleOCRAdapter:
+        # Loaded on first escalation; call load() to pay that up front (e.g. before forking)
+        if self._full is None:
+            with self._full_lock:
+                if self._full is None:
+                    self._full = PaddleOCRAdapter(self.lang, self.cpu_threads, tier="full")
+        return self._full
+
+    def load(self):
+        return self.full
+
+    # --- Helpers ---
+
+    def _to_document(self, paddle_lines, page: int, offset=(0.0, 0.0), scale: float = 1.0) -> OCRDocument:
+        """Paddle output -> one page's OCRDocument, mapping coordinates back into fast-tier space."""
+        builder = DocumentBuilder()
+        for box, (text, confidence) in paddle_lines:
+            builder.add(text, box, confidence, page)
+        doc = builder.build()
+        if offset != (0.0, 0.0) or scale != 1.0:
+            doc.boxes = doc.boxes / np.float32(scale) + np.asarray(offset, dtype=np.float32)
+        return doc
+
+    def _page_confidence(self, doc: OCRDocument) -> float:
+        # Length-weighted, so a long garbled line counts more than a stray "|"
+        if not len(doc):
+            return 0.0
+        weights = np.maximum(np.diff(doc.text_offsets), 1)
+        return float(np.average(doc.confidences, weights=weights))
+
+    def _regions(self, doc: OCRDocument) -> List[List[float]]:
+        """Padded bounding rects around low-confidence lines, overlapping rects merged."""
+        boxes = doc.boxes[doc.confidences < self.line_threshold]
+        x0, y0 = boxes[:, :, 0].min(axis=1), boxes[:, :, 1].min(axis=1)
+        x1, y1 = boxes[:, :, 0].max(axis=1), boxes[:, :, 1].max(axis=1)
+        pad = np.maximum(4.0, (y1 - y0) * 0.5)
+        rects = np.stack([x0 - pad, y0 - pad, x1 + pad, y1 + pad], axis=1).tolist()
+
+        merged = []
+        for rect in sorted(rects, key=lambda r: (r[1], r[0])):
+            for m in merged:
+                if rect[0] <= m[2] and rect[2] >= m[0] and rect[1] <= m[3] and rect[3] >= m[1]:
+                    m[:] = [min(m[0], rect[0]), min(m[1], rect[1]), max(m[2], rect[2]), max(m[3], rect[3])]
+                    break
+            else:
+                merged.append(rect)
+        return merged
+
+    def _inside(self, doc: OCRDocument, rect: List[float]) -> np.ndarray:
+        """Mask of lines whose box center lies in rect."""
+        center = doc.boxes.mean(axis=1)
+        return (rect[0] <= center[:, 0]) & (center[:, 0] <= rect[2]) & (rect[1] <= center[:, 1]) & (center[:, 1] <= rect[3])
+
+    def _full_image(self, file_bytes: bytes, filename: str, fast_images, page: int):
+        if filename.lower().endswith('.pdf'):
+            return self.full.load_pages(file_bytes, filename, [page])[page]
+        return fast_images[page]
+
+    def _rerun_regions(self, image, page: int, doc: OCRDocument, scale: float):
+        """Re-read low-confidence regions from the full-DPI image. Returns (document, regions_run)."""
+        regions = self._regions(doc)
+        for rect in regions:
+            x0, y0 = max(0.0, rect[0]), max(0.0, rect[1])
+            box = (int(x0 * scale), int(y0 * scale), int(rect[2] * scale), int(rect[3] * scale))
+            crop = image.crop(box)
+            crop = crop.resize((int(crop.width * self.region_upscale), int(crop.height * self.region_upscale)), Image.LANCZOS)
+
+            new_doc = self._to_document(self.full.ocr_image(crop), page, offset=(box[0] / scale, box[1] / scale), scale=scale * self.region_upscale)
+            inside = self._inside(doc, rect)
+            if len(new_doc) and self._page_confidence(new_doc) > self._page_confidence(doc.take(np.flatnonzero(inside))):
+                doc = OCRDocument.concat([doc.take(np.flatnonzero(~inside)), new_doc])
+        return doc, len(regions)
+
+    # --- Entry point ---
+
+    def page_count(self, file_bytes: bytes, filename: str) -> int:
+        return self.fast.page_count(file_bytes, filename)
+
+    def process_document(self, file_bytes: bytes, filename: str, evaluate: Callable[[OCRDocument], float] = None, pages=None) -> OCRDocument:
+        """
+        evaluate: optional callback scoring a candidate result (0.0 - 1.0), normally the
+        extraction confidence. Without it, escalation is driven by OCR confidences alone.
+        pages: optional 1-based page numbers to OCR (default: all).
+        """
+        seconds = {}
+        start = time.perf_counter()
+
+        images = self.fast.load_pages(file_bytes, filename, pages)
+        pages = {page: self._to_document(lines, page) for page, lines in self.fast._ocr_pages(images)}
+        seconds["fast"] = time.perf_counter() - start
+
+        flatten = lambda: OCRDocument.concat([pages[page] for page in sorted(pages)])
+        result = flatten()
+        fast_score = evaluate(result) if evaluate else None
+        score_ok = fast_score is None or fast_score >= self.score_threshold
+        weak_pages = [p for p, doc in pages.items() if self._page_confidence(doc) < self.page_threshold]
+
+        if score_ok and not weak_pages:
+            self.stats.record("fast", {"fast": len(pages)}, 0, seconds, [], fast_score, fast_score)
+            return result
+
+        reasons = ([] if score_ok else ["score"]) + (["page_confidence"] if weak_pages else [])
+        is_pdf = filename.lower().endswith('.pdf')
+        scale = self.full.dpi / self.fast.dpi if is_pdf else 1.0
+
+        full_pages = list(weak_pages)
+        region_pages = []
+        if not score_ok:
+            region_pages = [p for p in pages if p not in weak_pages and np.any(pages[p].confidences < self.line_threshold)]
+            if not full_pages and not region_pages:
+                # Nothing to localize: the cheap pass probably missed text outright
+                full_pages = list(pages)
+
+        regions_run = 0
+        if region_pages:
+            region_start = time.perf_counter()
+            for page in region_pages:
+                image = self._full_image(file_bytes, filename, images, page)
+                pages[page], n = self._rerun_regions(image, page, pages[page], scale)
+                regions_run += n
+            seconds["region"] = time.perf_counter() - region_start
+
+        if full_pages:
+            full_start = time.perf_counter()
+            for page in full_pages:
+                image = self._full_image(file_bytes, filename, images, page)
+                pages[page] = self._to_document(self.full.ocr_image(image), page, scale=scale)
+            seconds["full"] = time.perf_counter() - full_start
+
+        result = flatten()
+        final_score = evaluate(result) if evaluate else None
+        final_tier = "full" if full_pages else "region"
+        self.stats.record(final_tier, {"fast": len(pages), "full": len(full_pages)}, regions_run, seconds, reasons, fast_score, final_score)
+        return result
+
+    def process_file(self, file_bytes: bytes, filename: str, evaluate: Callable[[OCRDocument], float] = None, pages=None) -> List[Dict]:
+        """process_document as line dicts, same shape as PaddleOCRAdapter.process_file."""
+        return self.process_document(file_bytes, filename, evaluate=evaluate, pages=pages).to_dicts()
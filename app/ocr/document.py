@@ -0,0 +1,238 @@
+import json
+import mmap
+from typing import List, Dict, Iterator
+
+import numpy as np
+
+MAGIC = b"OCRDOC1\n"
+ALIGNMENT = 64
+
+
+class OCRDocument:
+    """
+    Columnar OCR output: one array per attribute instead of one dict per line.
+
+    boxes:        float32 (n, 4, 2) - the 4 corner points per line, same order as PaddleOCR
+    confidences:  float32 (n,)
+    pages:        int32   (n,)     - 1-based page numbers
+    text_data:    uint8   (bytes,) - UTF-8 text of all lines, back to back
+    text_offsets: int64   (n + 1,) - line i is text_data[text_offsets[i]:text_offsets[i + 1]]
+
+    Slicing (page(), slice()) returns views sharing the same buffers, so per-page and per-row
+    access never copies text or boxes.
+    """
+
+    def __init__(self, boxes, confidences, pages, text_data, text_offsets):
+        self.boxes = boxes
+        self.confidences = confidences
+        self.pages = pages
+        self.text_data = text_data
+        self.text_offsets = text_offsets
+
+    # --- Construction ---
+
+    @classmethod
+    def empty(cls) -> "OCRDocument":
+        return cls(
+            np.zeros((0, 4, 2), dtype=np.float32),
+            np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.uint8),
+            np.zeros(1, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_lines(cls, lines: List[Dict]) -> "OCRDocument":
+        """Build from the list-of-dicts format returned by PaddleOCRAdapter.process_file."""
+        builder = DocumentBuilder()
+        for line in lines:
+            builder.add(line["text"], line["box"], line["confidence"], line.get("page", 1))
+        return builder.build()
+
+    @classmethod
+    def concat(cls, docs: List["OCRDocument"]) -> "OCRDocument":
+        """One document from several (e.g. pages OCRed separately), in the given order."""
+        docs = [d for d in docs if len(d)]
+        if not docs:
+            return cls.empty()
+        arrays = [d._arrays() for d in docs]
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for a in arrays:
+            offsets.append(a["text_offsets"][1:] + base)
+            base += len(a["text_data"])
+        return cls(
+            np.concatenate([a["boxes"] for a in arrays]),
+            np.concatenate([a["confidences"] for a in arrays]),
+            np.concatenate([a["pages"] for a in arrays]),
+            np.concatenate([a["text_data"] for a in arrays]),
+            np.concatenate(offsets),
+        )
+
+    # --- Access ---
+
+    def __len__(self) -> int:
+        return len(self.confidences)
+
+    def text(self, i: int) -> str:
+        start, end = self.text_offsets[i], self.text_offsets[i + 1]
+        return self.text_data[start:end].tobytes().decode("utf-8")
+
+    def texts(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.text(i)
+
+    @property
+    def page_numbers(self) -> List[int]:
+        return np.unique(self.pages).tolist()
+
+    def slice(self, start: int, end: int) -> "OCRDocument":
+        """Zero-copy view over lines [start, end)."""
+        return OCRDocument(
+            self.boxes[start:end],
+            self.confidences[start:end],
+            self.pages[start:end],
+            self.text_data,
+            self.text_offsets[start:end + 1],
+        )
+
+    def take(self, indices) -> "OCRDocument":
+        """Copy of the selected lines, in the given order."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.text_offsets[indices]
+        ends = self.text_offsets[indices + 1]
+        lengths = ends - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if len(indices):
+            text_data = np.concatenate([self.text_data[s:e] for s, e in zip(starts, ends)])
+        else:
+            text_data = np.zeros(0, dtype=np.uint8)
+        return OCRDocument(self.boxes[indices], self.confidences[indices], self.pages[indices], text_data, offsets)
+
+    def page(self, page_number: int) -> "OCRDocument":
+        """Lines of one page. A view when the document is page-ordered (as built by the OCR adapter)."""
+        if len(self) and np.all(self.pages[:-1] <= self.pages[1:]):
+            start = int(np.searchsorted(self.pages, page_number, side="left"))
+            end = int(np.searchsorted(self.pages, page_number, side="right"))
+            return self.slice(start, end)
+        return self.take(np.flatnonzero(self.pages == page_number))
+
+    def reading_order(self) -> np.ndarray:
+        """Line indices sorted by top-left Y, then X (the order TextCleaner.merge_lines uses)."""
+        return np.lexsort((self.boxes[:, 0, 0], self.boxes[:, 0, 1]))
+
+    def rows(self, y_tolerance: float = 10) -> List[np.ndarray]:
+        """
+        Group lines into rows: in reading order, a line starts a new row when its top Y is more
+        than y_tolerance below the first line of the current row. Returns index arrays per row.
+        """
+        order = self.reading_order()
+        if not len(order):
+            return []
+        y_top = self.boxes[order, 0, 1]
+
+        breaks = []
+        row_y = y_top[0]
+        for i in range(1, len(y_top)):
+            if abs(y_top[i] - row_y) > y_tolerance:
+                breaks.append(i)
+                row_y = y_top[i]
+        return np.split(order, breaks)
+
+    def to_dicts(self) -> List[Dict]:
+        """Materialize the list-of-dicts format, for code that still needs it."""
+        return [
+            {
+                "text": self.text(i),
+                "box": self.boxes[i].tolist(),
+                "confidence": float(self.confidences[i]),
+                "page": int(self.pages[i]),
+            }
+            for i in range(len(self))
+        ]
+
+    # --- Serialization ---
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        # Rebase text so a view of a larger document saves only its own text
+        start, end = int(self.text_offsets[0]), int(self.text_offsets[-1])
+        return {
+            "boxes": np.ascontiguousarray(self.boxes),
+            "confidences": np.ascontiguousarray(self.confidences),
+            "pages": np.ascontiguousarray(self.pages),
+            "text_data": np.ascontiguousarray(self.text_data[start:end]),
+            "text_offsets": np.ascontiguousarray(self.text_offsets - start),
+        }
+
+    def save(self, path: str):
+        """
+        Write a single file: magic, header length, JSON header, then each array at a 64-byte
+        aligned offset so load() can map them straight from disk.
+        """
+        arrays = self._arrays()
+        header = {}
+        offset = 0
+        for name, arr in arrays.items():
+            header[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+            offset += -(-arr.nbytes // ALIGNMENT) * ALIGNMENT
+
+        header_bytes = json.dumps(header).encode()
+        data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header_bytes).to_bytes(8, "little"))
+            f.write(header_bytes)
+            for name, arr in arrays.items():
+                f.seek(data_start + header[name]["offset"])
+                arr.tofile(f)
+            # Pad the tail so every array's aligned extent exists on disk
+            f.truncate(data_start + offset)
+
+    @classmethod
+    def load(cls, path: str) -> "OCRDocument":
+        """Memory-map a file written by save(). Arrays are read-only views onto the mapping."""
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not an OCR document file: {path}")
+            header_len = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_len))
+            data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGNMENT) * ALIGNMENT
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        arrays = {}
+        for name, spec in header.items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + spec["offset"]).reshape(spec["shape"])
+        return cls(**arrays)
+
+
+class DocumentBuilder:
+    """Accumulates OCR lines into flat buffers, then packs them into an OCRDocument in one go."""
+
+    def __init__(self):
+        self._boxes = []
+        self._confidences = []
+        self._pages = []
+        self._text = bytearray()
+        self._offsets = [0]
+
+    def add(self, text: str, box, confidence: float, page: int):
+        self._text += text.encode("utf-8")
+        self._offsets.append(len(self._text))
+        self._boxes.append(box)
+        self._confidences.append(confidence)
+        self._pages.append(page)
+
+    def build(self) -> OCRDocument:
+        if not self._confidences:
+            return OCRDocument.empty()
+        return OCRDocument(
+            np.asarray(self._boxes, dtype=np.float32).reshape(-1, 4, 2),
+            np.asarray(self._confidences, dtype=np.float32),
+            np.asarray(self._pages, dtype=np.int32),
+            np.frombuffer(bytes(self._text), dtype=np.uint8),
+            np.asarray(self._offsets, dtype=np.int64),
+        )
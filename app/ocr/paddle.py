@@ -1,28 +1,56 @@
 from paddleocr import PaddleOCR
-from pdf2image import convert_from_path, convert_from_bytes
+from pdf2image import convert_from_path, convert_from_bytes, pdfinfo_from_bytes
 import numpy as np
 import io
+import os
 from PIL import Image
 
+from app.ocr.document import OCRDocument, DocumentBuilder
+
+# Quality tiers (see app/ocr/adaptive.py)
+OCR_TIERS = {
+    # Cheap first pass: lower PDF render DPI, no orientation classifier, detection on a smaller
+    # image (Paddle's default limit is 960px) and optionally lighter models (see below)
+    "fast": {"dpi": 150, "use_angle_cls": False, "det_limit_side_len": 640, "model_env": "OCR_FAST"},
+    # Original settings
+    "full": {"dpi": 200, "use_angle_cls": True},
+}
+
+# User provided Poppler path
+POPPLER_PATH = r"C:\Program Files\Release-25.12.0-0\poppler-25.12.0\Library\bin"
+
 class PaddleOCRAdapter:
-    def __init__(self, lang='en'):
+    def __init__(self, lang='en', cpu_threads=None, tier='full'):
+        # Paddle defaults to 10 inference threads per instance, which oversubscribes
+        # the CPU once several workers run side by side (see app/server.py)
+        cpu_threads = cpu_threads or int(os.getenv("OCR_CPU_THREADS", "0"))
+        options = {"cpu_threads": cpu_threads} if cpu_threads else {}
+
+        settings = OCR_TIERS[tier]
+        self.tier = tier
+        self.dpi = settings["dpi"]
+        self.use_angle_cls = settings["use_angle_cls"]
+
+        if "det_limit_side_len" in settings:
+            options["det_limit_side_len"] = settings["det_limit_side_len"]
+        # e.g. OCR_FAST_DET_MODEL_DIR / OCR_FAST_REC_MODEL_DIR: slim or mobile PP-OCR models for the fast tier
+        prefix = settings.get("model_env")
+        for model in ("det", "rec") if prefix else ():
+            model_dir = os.getenv(f"{prefix}_{model.upper()}_MODEL_DIR")
+            if model_dir:
+                options[f"{model}_model_dir"] = model_dir
+
         # use_angle_cls=True enables orientation classification
-        self.ocr = PaddleOCR(use_angle_cls=True, lang=lang)
+        self.ocr = PaddleOCR(use_angle_cls=self.use_angle_cls, lang=lang, **options)
 
-    def process_file(self, file_bytes: bytes, filename: str):
-        """
-        Process a file (PDF or Image) and return extracted text with metadata.
-        Returns a list of pages, where each page is a list of lines.
-        Each line: {'text': str, 'box': [[x1,y1], [x2,y2], [x3,y3], [x4,y4]], 'confidence': float}
-        """
+    def _load_images(self, file_bytes: bytes, filename: str, first_page=None, last_page=None):
         images = []
         if filename.lower().endswith('.pdf'):
             try:
-                # User provided Poppler path
-                POPPLER_PATH = r"C:\Program Files\Release-25.12.0-0\poppler-25.12.0\Library\bin"
-                
                 # Convert PDF bytes to images
-                images = convert_from_bytes(file_bytes, poppler_path=POPPLER_PATH)
+                images = convert_from_bytes(
+                    file_bytes, dpi=self.dpi, first_page=first_page, last_page=last_page, poppler_path=POPPLER_PATH
+                )
             except Exception as e:
                 print(f"Error converting PDF: {e}")
                 # Fallback or re-raise depending on requirements. 
@@ -35,27 +63,79 @@ class PaddleOCRAdapter:
                 images = [image]
             except Exception as e:
                 raise ValueError(f"Failed to open image: {str(e)}")
+        return images
+
+    def page_count(self, file_bytes: bytes, filename: str) -> int:
+        if not filename.lower().endswith('.pdf'):
+            return 1
+        try:
+            return int(pdfinfo_from_bytes(file_bytes, poppler_path=POPPLER_PATH)["Pages"])
+        except Exception as e:
+            raise ValueError(f"Failed to read PDF info: {str(e)}")
+
+    def load_pages(self, file_bytes: bytes, filename: str, pages=None):
+        """
+        Render pages to images: {page_number: image}. pages=None renders all of them;
+        otherwise only the span covering the requested pages is rasterized.
+        """
+        if pages is None or not filename.lower().endswith('.pdf'):
+            images = dict(enumerate(self._load_images(file_bytes, filename), start=1))
+        else:
+            first, last = min(pages), max(pages)
+            images = dict(enumerate(self._load_images(file_bytes, filename, first_page=first, last_page=last), start=first))
+        if pages is not None:
+            images = {p: img for p, img in images.items() if p in pages}
+        return images
+
+    def ocr_image(self, img):
+        """Run OCR on one PIL image. Returns paddle lines: [ [box, (text, confidence)], ... ]"""
+        # PaddleOCR expects numpy array
+        img_np = np.array(img)
+        
+        # Run OCR
+        # result structure: [ [ [ [x1,y1], ... ], (text, confidence) ], ... ]
+        ocr_result = self.ocr.ocr(img_np, cls=self.use_angle_cls)
+        return ocr_result[0] if ocr_result and ocr_result[0] else []
+
+    def _ocr_pages(self, images):
+        """Yield (page_number, paddle_lines) per {page_number: image}."""
+        for page in sorted(images):
+            yield page, self.ocr_image(images[page])
+
+    def process_file(self, file_bytes: bytes, filename: str, pages=None):
+        """
+        Process a file (PDF or Image) and return extracted text with metadata.
+        Returns a list of pages, where each page is a list of lines.
+        Each line: {'text': str, 'box': [[x1,y1], [x2,y2], [x3,y3], [x4,y4]], 'confidence': float}
+        pages: optional 1-based page numbers to OCR (default: all).
+        """
+        images = self.load_pages(file_bytes, filename, pages)
 
         results = []
-        for i, img in enumerate(images):
-            # PaddleOCR expects numpy array
-            img_np = np.array(img)
-            
-            # Run OCR
-            # result structure: [ [ [ [x1,y1], ... ], (text, confidence) ], ... ]
-            ocr_result = self.ocr.ocr(img_np, cls=True)
-            
+        for page, lines in self._ocr_pages(images):
             page_lines = []
-            if ocr_result and ocr_result[0]:
-                for line in ocr_result[0]:
-                    box = line[0]
-                    text, confidence = line[1]
-                    page_lines.append({
-                        "text": text,
-                        "box": box,
-                        "confidence": confidence,
-                        "page": i + 1
-                    })
+            for line in lines:
+                box = line[0]
+                text, confidence = line[1]
+                page_lines.append({
+                    "text": text,
+                    "box": box,
+                    "confidence": confidence,
+                    "page": page
+                })
             results.extend(page_lines)
             
         return results
+
+    def process_document(self, file_bytes: bytes, filename: str, pages=None) -> OCRDocument:
+        """
+        Same as process_file, but packs the lines straight into a columnar OCRDocument
+        without building a dict per line. Preferred for dense multi-page documents.
+        """
+        images = self.load_pages(file_bytes, filename, pages)
+
+        builder = DocumentBuilder()
+        for page, lines in self._ocr_pages(images):
+            for box, (text, confidence) in lines:
+                builder.add(text, box, confidence, page)
+        return builder.build()
@@ -0,0 +1,166 @@
+from typing import List, Dict, Any, Callable, Awaitable, Union
+
+from app.ocr.document import OCRDocument
+
+HEADER_FIELDS = ("vendor_name", "invoice_number", "invoice_date", "currency")
+TOTAL_FIELDS = ("subtotal", "tax", "total")
+
+
+class IncrementalScan:
+    """
+    Page-incremental extraction for multi-page documents. Instead of OCRing every page and then
+    extracting over the lot, pages are read in the order their fields usually turn up:
+
+    1. page 1       -> header fields (vendor, invoice number, date, currency)
+    2. last page    -> totals
+    3. middle pages -> only when line items were requested or a field is still missing
+
+    run() yields a partial-result event after each step. A field is final once found: later
+    pages only fill in what is still missing, they never overwrite. The one exception is the
+    currency: page 1 gives a first guess, which is re-ranked against the totals (as /scan
+    does) whenever they are extracted. read_remaining() then OCRs
+    whatever pages were skipped, so the stored text and line items cover the whole document.
+
+    extractors: {"vendor_name", "invoice_number", "invoice_date", "currency", "totals", "line_items"}
+    template_lookup: vendor name -> CompiledTemplate or None
+    """
+
+    def __init__(self, cleaner, extractors: Dict[str, Any], template_lookup: Callable = None):
+        self.cleaner = cleaner
+        self.extractors = extractors
+        self.template_lookup = template_lookup
+        self.template = None
+
+        self.page_count = 0
+        self.pages: Dict[int, OCRDocument] = {}
+        self._merged: Dict[int, List[str]] = {}
+        self._raw_lines = None  # concatenation of self.pages, rebuilt after a page is added
+        self.data: Dict[str, Any] = {field: None for field in HEADER_FIELDS + TOTAL_FIELDS}
+        self.data["line_items"] = []
+
+    @property
+    def raw_lines(self) -> OCRDocument:
+        if self._raw_lines is None:
+            self._raw_lines = OCRDocument.concat([self.pages[page] for page in sorted(self.pages)])
+        return self._raw_lines
+
+    @property
+    def merged_lines(self) -> List[str]:
+        # Merged per page and concatenated in page order, so rows from different pages never interleave
+        return [line for page in sorted(self._merged) for line in self._merged[page]]
+
+    @property
+    def complete(self) -> bool:
+        return len(self.pages) == self.page_count
+
+    def missing(self) -> List[str]:
+        # subtotal / tax are often legitimately absent, so only the total keeps middle pages in play
+        return [f for f in HEADER_FIELDS + ("total",) if self.data[f] is None]
+
+    def add_page(self, page: int, lines: Union[List[Dict], OCRDocument]):
+        if not isinstance(lines, OCRDocument):
+            lines = OCRDocument.from_lines(lines)
+        self.pages[page] = lines
+        self._raw_lines = None
+        self._merged[page] = self.cleaner.merge_lines(lines)
+
+    # --- Extraction over the pages read so far ---
+
+    def _templated(self) -> Dict[str, Any]:
+        if self.template is None and self.template_lookup and self.data["vendor_name"]:
+            self.template = self.template_lookup(self.data["vendor_name"])
+        if self.template is None:
+            return {}
+        return self.template.apply(self.raw_lines, last_page=self.page_count)
+
+    def extract_header(self):
+        merged_lines = self.merged_lines
+        if self.data["vendor_name"] is None:
+            self.data["vendor_name"] = self.extractors["vendor_name"].extract(merged_lines)
+
+        templated = self._templated()
+        for field in ("invoice_number", "invoice_date"):
+            if self.data[field] is None:
+                self.data[field] = templated.get(field) or self.extractors[field].extract(merged_lines)
+        if self.data["currency"] is None:
+            amounts = [self.data[f] for f in TOTAL_FIELDS]
+            self.data["currency"] = self.extractors["currency"].extract(merged_lines, amounts=amounts)
+
+    def extract_totals(self):
+        # TotalsExtractor searches bottom-up, and the last page sorts last, so it is searched first
+        templated = self._templated()
+        if all(f in templated for f in TOTAL_FIELDS):
+            totals = {f: templated[f] for f in TOTAL_FIELDS}
+        else:
+            totals = self.extractors["totals"].extract(self.merged_lines)
+            totals.update({f: v for f, v in templated.items() if f in totals})
+        for field, value in totals.items():
+            if self.data[field] is None:
+                self.data[field] = value
+        self.rank_currency()
+
+    def rank_currency(self):
+        """Re-detect the currency over the pages read so far, with lines near the totals counting more."""
+        amounts = [self.data[f] for f in TOTAL_FIELDS]
+        if all(a is None for a in amounts):
+            return
+        currency = self.extractors["currency"].extract(self.merged_lines, amounts=amounts)
+        if currency is not None:
+            self.data["currency"] = currency
+
+    def event(self, name: str, pages: List[int]) -> Dict[str, Any]:
+        return {
+            "event": name,
+            "pages": pages,
+            "pages_read": sorted(self.pages),
+            "page_count": self.page_count,
+            "fields": {f: self.data[f] for f in HEADER_FIELDS + TOTAL_FIELDS},
+            "missing": self.missing(),
+        }
+
+    # --- Driver ---
+
+    async def run(self, read_pages: Callable[[List[int]], Awaitable[List[Dict]]], page_count: int, line_items: bool = False):
+        """
+        read_pages: OCRs the given 1-based pages, returning an OCRDocument (or line dicts tagged with "page").
+        Yields "header", "totals" and "page" events; self.data holds the final fields afterwards.
+        """
+        self.page_count = page_count
+
+        async def read(pages: List[int]):
+            await self._read(read_pages, pages)
+
+        await read([1])
+        self.extract_header()
+        yield self.event("header", [1])
+
+        if page_count > 1:
+            await read([page_count])
+            self.extract_header()
+        self.extract_totals()
+        yield self.event("totals", [page_count])
+
+        for page in range(2, page_count):
+            if not line_items and not self.missing():
+                break
+            await read([page])
+            self.extract_header()
+            self.extract_totals()
+            yield self.event("page", [page])
+
+        if line_items:
+            self.data["line_items"] = self.extractors["line_items"].extract(self.raw_lines)
+
+    async def read_remaining(self, read_pages: Callable[[List[int]], Awaitable[List[Dict]]]):
+        """OCR the pages run() skipped (in one call) and extract line items over the full document. Fields stay as they are."""
+        pages = [page for page in range(1, self.page_count + 1) if page not in self.pages]
+        if pages:
+            await self._read(read_pages, pages)
+        self.data["line_items"] = self.extractors["line_items"].extract(self.raw_lines)
+
+    async def _read(self, read_pages, pages: List[int]):
+        doc = await read_pages(pages)
+        if not isinstance(doc, OCRDocument):
+            doc = OCRDocument.from_lines(doc)
+        for page in pages:
+            self.add_page(page, doc.page(page))
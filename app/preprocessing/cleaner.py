@@ -1,5 +1,7 @@
 import re
-from typing import List, Dict
+from typing import List, Dict, Union
+
+from app.ocr.document import OCRDocument
 
 class TextCleaner:
     def __init__(self):
@@ -15,12 +17,15 @@ class TextCleaner:
         text = re.sub(r'\s+', ' ', text).strip()
         return text
 
-    def merge_lines(self, raw_lines: List[Dict], y_tolerance=10) -> List[str]:
+    def merge_lines(self, raw_lines: Union[List[Dict], OCRDocument], y_tolerance=10) -> List[str]:
         """
         Sorts lines by Y position, then X position.
         Concatenates lines that are likely on the same row.
         Returns a list of strings (lines of text).
         """
+        if isinstance(raw_lines, OCRDocument):
+            return self.merge_document(raw_lines, y_tolerance)
+
         if not raw_lines:
             return []
 
@@ -58,6 +63,35 @@ class TextCleaner:
 
         return merged_lines
 
+    def merge_document(self, doc: OCRDocument, y_tolerance=10) -> List[str]:
+        """merge_lines for a columnar OCRDocument: sorts with the box arrays, no per-line dicts."""
+        if not len(doc):
+            return []
+
+        order = doc.reading_order()
+        y_tops = doc.boxes[order, 0, 1].tolist()
+
+        merged_lines = []
+        current_line_text = []
+        current_y = None
+
+        for i, y_top in zip(order.tolist(), y_tops):
+            text = self.normalize_text(doc.text(i))
+            if not text:
+                continue
+
+            if current_y is not None and abs(y_top - current_y) > y_tolerance:
+                merged_lines.append(" ".join(current_line_text))
+                current_line_text = []
+            if not current_line_text:
+                current_y = y_top
+            current_line_text.append(text)
+
+        if current_line_text:
+            merged_lines.append(" ".join(current_line_text))
+
+        return merged_lines
+
     def normalize_currency(self, text: str) -> str:
         """
         Normalize currency symbols and formats.
@@ -0,0 +1,288 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Keep the profiler's own bookkeeping out of the allocation report
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+]
+
+
+def fold_stack(frame) -> str:
+    """Collapsed-stack line (root first, ';' separated) as consumed by flamegraph.pl / speedscope."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler. One background thread wakes every `interval` seconds and
+    records the current stack of each attached thread, credited to the profile that attached it.
+    Cost is paid only while at least one profile is attached.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._targets = {}  # thread id -> ScanProfile
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def attach(self, profile: "ScanProfile", thread_id: int):
+        with self._lock:
+            self._targets[thread_id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+
+    def detach(self, thread_id: int):
+        with self._lock:
+            self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = dict(self._targets)
+            frames = sys._current_frames()
+            for thread_id, profile in targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.add_sample(fold_stack(frame))
+            del frames
+            time.sleep(self.interval)
+
+
+class ScanProfile:
+    """
+    Stage timings for one /scan request. When `sampled`, stages also run under the stack
+    sampler and take tracemalloc snapshots (memory deltas + top allocation sites per stage).
+    """
+
+    def __init__(self, profiler: "Profiler", filename: str, sampled: bool):
+        self.profiler = profiler
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.sampled = sampled
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages = []
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+
+    def add_sample(self, stack: str):
+        with self._lock:
+            self.stacks[stack] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage. Safe to use from worker threads (e.g. around OCR)."""
+        thread_id = threading.get_ident()
+        before = None
+        if self.sampled:
+            self.profiler.sampler.attach(self, thread_id)
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+                before = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {"name": name, "seconds": round(time.perf_counter() - start, 4)}
+            if self.sampled:
+                self.profiler.sampler.detach(thread_id)
+                if before is not None and tracemalloc.is_tracing():
+                    record["memory"] = self._memory_delta(before)
+            with self._lock:
+                self.stages.append(record)
+
+    def record(self, name: str, seconds: float):
+        """Add a stage measured elsewhere (e.g. time spent queued for OCR)."""
+        with self._lock:
+            self.stages.append({"name": name, "seconds": round(max(seconds, 0.0), 4)})
+
+    def _memory_delta(self, before) -> Dict:
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        top = after.compare_to(before, "lineno")[:self.profiler.top_allocations]
+        return {
+            "current_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [
+                {"where": str(stat.traceback[0]), "size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+                for stat in top
+            ],
+        }
+
+    @property
+    def total_seconds(self) -> float:
+        return round(time.perf_counter() - self._start, 4)
+
+    def summary(self, invoice_id: Optional[int] = None, error: Optional[str] = None) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "invoice_id": invoice_id,
+            "filename": self.filename,
+            "started_at": self.started_at,
+            "total_seconds": self.total_seconds,
+            "stages": list(self.stages),
+            "profiled": self.sampled,
+            "error": error,
+        }
+
+
+class Profiler:
+    """
+    Opt-in profiling for /scan. A request is profiled when it asks for it (X-Profile header, admins
+    only) or is picked by PROFILE_SAMPLE_RATE (0.0 - 1.0). At most PROFILE_MAX_ACTIVE scans are
+    profiled at once; beyond that, scans fall back to plain timings. Every scan gets cheap stage
+    timings for the slowest-scans view; profiled scans additionally store artifacts under PROFILE_DIR:
+
+        <job_id>.json    stage timings + per-stage memory snapshots
+        <job_id>.folded  collapsed stacks for flamegraph tools
+        index.jsonl      job id -> invoice id
+
+    Only the last PROFILE_RETENTION jobs are kept: once the index holds twice that many, it is
+    compacted and the artifacts of older jobs are deleted.
+
+    tracemalloc and the sampler see the whole process, so concurrent requests can bleed into a
+    profile; profile on a quiet worker when precision matters.
+    """
+
+    def __init__(self, directory: str = None, sample_rate: float = None, interval: float = None, recent: int = 1000, top_allocations: int = 10,
+                 max_active: int = None, retention: int = None):
+        self.directory = directory or os.getenv("PROFILE_DIR", "profiles")
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.sampler = StackSampler(interval if interval is not None else float(os.getenv("PROFILE_INTERVAL", "0.005")))
+        self.top_allocations = top_allocations
+        self.max_active = max_active if max_active is not None else int(os.getenv("PROFILE_MAX_ACTIVE", "2"))
+        self.retention = retention if retention is not None else int(os.getenv("PROFILE_RETENTION", "500"))
+        self.recent = deque(maxlen=recent)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._indexed = None  # lines in index.jsonl, counted on the first save
+
+    def begin(self, filename: str, requested: bool = False) -> ScanProfile:
+        sampled = requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        if sampled:
+            with self._lock:
+                if self._active >= self.max_active:
+                    sampled = False
+                else:
+                    self._active += 1
+                    if not tracemalloc.is_tracing():
+                        tracemalloc.start()
+        return ScanProfile(self, filename, sampled)
+
+    def finish(self, profile: ScanProfile, invoice_id: Optional[int] = None, error: Optional[str] = None) -> Dict:
+        summary = profile.summary(invoice_id, error)
+        self.recent.append(summary)
+
+        if profile.sampled:
+            with self._lock:
+                self._active -= 1
+                if not self._active and tracemalloc.is_tracing():
+                    tracemalloc.stop()
+            self._save(profile, summary)
+        return summary
+
+    # --- Artifacts ---
+
+    def _path(self, job_id: str, ext: str) -> str:
+        # job ids are uuid hex; reject anything else so ids can't walk the filesystem
+        if not job_id.isalnum():
+            raise ValueError(f"Invalid job id: {job_id}")
+        return os.path.join(self.directory, f"{job_id}.{ext}")
+
+    def _save(self, profile: ScanProfile, summary: Dict):
+        os.makedirs(self.directory, exist_ok=True)
+        artifact = dict(summary, samples=sum(profile.stacks.values()), interval=self.sampler.interval)
+        with open(self._path(profile.job_id, "json"), "w") as f:
+            json.dump(artifact, f, indent=2)
+        with open(self._path(profile.job_id, "folded"), "w") as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with self._index_lock:
+            index = os.path.join(self.directory, "index.jsonl")
+            if self._indexed is None:
+                self._indexed = len(self._read_index()) if os.path.exists(index) else 0
+            with open(index, "a") as f:
+                f.write(json.dumps({"job_id": profile.job_id, "invoice_id": summary["invoice_id"]}) + "\n")
+            self._indexed += 1
+            if self._indexed > 2 * self.retention:
+                self._prune()
+
+    def _read_index(self) -> List[Dict]:
+        with open(os.path.join(self.directory, "index.jsonl")) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _prune(self):
+        """Keep the newest `retention` jobs: delete older artifacts and rewrite the index."""
+        entries = self._read_index()
+        keep = entries[-self.retention:] if self.retention else []
+        kept = {entry["job_id"] for entry in keep}
+        for entry in entries:
+            if entry["job_id"] in kept:
+                continue
+            for ext in ("json", "folded"):
+                try:
+                    os.remove(self._path(entry["job_id"], ext))
+                except (FileNotFoundError, ValueError):
+                    pass
+        index = os.path.join(self.directory, "index.jsonl")
+        with open(index + ".tmp", "w") as f:
+            for entry in keep:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(index + ".tmp", index)
+        self._indexed = len(keep)
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        path = self._path(job_id, "json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def load_folded(self, job_id: str) -> Optional[str]:
+        path = self._path(job_id, "folded")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read()
+
+    def job_for_invoice(self, invoice_id: int) -> Optional[str]:
+        """Most recent profiled job for an invoice. The index is bounded by retention, so the scan is too."""
+        path = os.path.join(self.directory, "index.jsonl")
+        if not os.path.exists(path):
+            return None
+        job_id = None
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get("invoice_id") == invoice_id:
+                    job_id = entry["job_id"]
+        return job_id
+
+    def slowest(self, n: int = 10) -> List[Dict]:
+        """Slowest recent scans with their stage breakdown (memory details stay in the artifacts)."""
+        scans = sorted(self.recent, key=lambda s: s["total_seconds"], reverse=True)[:n]
+        return [
+            dict(scan, stages=[{"name": st["name"], "seconds": st["seconds"]} for st in scan["stages"]])
+            for scan in scans
+        ]
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+
+def tenant_id(api_key: Optional[str]) -> str:
+    """Stable tenant id for an API key. Keys are hashed so they never show up in metrics."""
+    if not api_key:
+        return "anonymous"
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """TENANT_WEIGHTS format: "tenant_id:weight,tenant_id:weight"."""
+    weights = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        tenant, _, weight = item.partition(":")
+        weights[tenant] = float(weight)
+    return weights
+
+
+class _Waiter:
+    __slots__ = ("tenant", "priority", "finish", "future", "enqueued_at")
+
+    def __init__(self, tenant, priority, finish, future):
+        self.tenant = tenant
+        self.priority = priority
+        self.finish = finish
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class ScanScheduler:
+    """
+    Admission control in front of the OCR stage.
+
+    - Strict priority between classes: interactive jobs always go first.
+    - Bulk jobs may never hold the slots reserved for interactive work.
+    - Within a class, tenants share capacity by weighted fair queuing (virtual finish tags),
+      so one tenant's 10k uploads interleave with everyone else's instead of blocking them.
+    - Each tenant has a cap on concurrently running jobs.
+
+    capacity is the number of OCR jobs run at once. The PaddleOCR engine is not safe to call
+    from several threads, so the default is 1 per process; scale out with app.server workers.
+    """
+
+    def __init__(self, capacity: int = None, tenant_limit: int = None, reserved_interactive: int = None, weights: Dict[str, float] = None, window: int = 1000):
+        self.capacity = capacity or int(os.getenv("SCAN_CONCURRENCY", "1"))
+        self.tenant_limit = tenant_limit or int(os.getenv("SCAN_TENANT_CONCURRENCY", "0")) or self.capacity
+        if reserved_interactive is None:
+            reserved_interactive = int(os.getenv("SCAN_RESERVED_INTERACTIVE", "1" if self.capacity > 1 else "0"))
+        self.reserved_interactive = min(reserved_interactive, self.capacity - 1)
+        self.weights = weights if weights is not None else parse_weights(os.getenv("TENANT_WEIGHTS", ""))
+
+        self._queues = {p: {} for p in PRIORITIES}  # priority -> tenant -> deque[_Waiter]
+        self._virtual_time = {p: 0.0 for p in PRIORITIES}
+        self._last_finish = {p: {} for p in PRIORITIES}
+        self._running = {p: 0 for p in PRIORITIES}
+        self._running_by_tenant = {}
+        self._waits = {p: deque(maxlen=window) for p in PRIORITIES}
+        self._completed = {p: 0 for p in PRIORITIES}
+
+    # --- Queueing ---
+
+    def _enqueue(self, tenant: str, priority: str) -> _Waiter:
+        weight = self.weights.get(tenant, 1.0)
+        start = max(self._virtual_time[priority], self._last_finish[priority].get(tenant, 0.0))
+        finish = start + 1.0 / weight
+        self._last_finish[priority][tenant] = finish
+
+        waiter = _Waiter(tenant, priority, finish, asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(tenant, deque()).append(waiter)
+        return waiter
+
+    def _class_has_room(self, priority: str) -> bool:
+        running = sum(self._running.values())
+        if running >= self.capacity:
+            return False
+        if priority == BULK:
+            return self._running[BULK] < self.capacity - self.reserved_interactive
+        return True
+
+    def _next_waiter(self, priority: str) -> Optional[_Waiter]:
+        best = None
+        queues = self._queues[priority]
+        for tenant in list(queues):
+            queue = queues[tenant]
+            # Drop waiters whose requests went away while queued
+            while queue and queue[0].future.done():
+                queue.popleft()
+            if not queue:
+                del queues[tenant]
+                continue
+            if self._running_by_tenant.get(tenant, 0) >= self.tenant_limit:
+                continue
+            if best is None or queue[0].finish < best.finish:
+                best = queue[0]
+        return best
+
+    def _dispatch(self):
+        for priority in PRIORITIES:
+            while self._class_has_room(priority):
+                waiter = self._next_waiter(priority)
+                if waiter is None:
+                    break
+                self._queues[priority][waiter.tenant].popleft()
+                self._virtual_time[priority] = max(self._virtual_time[priority], waiter.finish)
+                self._start(waiter.tenant, priority)
+                self._waits[priority].append(time.perf_counter() - waiter.enqueued_at)
+                waiter.future.set_result(None)
+
+    def _start(self, tenant: str, priority: str):
+        self._running[priority] += 1
+        self._running_by_tenant[tenant] = self._running_by_tenant.get(tenant, 0) + 1
+
+    def _release(self, tenant: str, priority: str):
+        self._running[priority] -= 1
+        self._running_by_tenant[tenant] -= 1
+        if not self._running_by_tenant[tenant]:
+            del self._running_by_tenant[tenant]
+        self._completed[priority] += 1
+        self._dispatch()
+
+    # --- Public API ---
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, priority: str = INTERACTIVE):
+        """Wait for an OCR slot for this tenant/priority, hold it for the duration of the block."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+
+        waiter = self._enqueue(tenant, priority)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # Granted at the same moment we were cancelled: hand the slot back
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(tenant, priority)
+            else:
+                waiter.future.cancel()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(tenant, priority)
+
+    async def run(self, tenant: str, priority: str, fn, *args, **kwargs):
+        """
+        Run a blocking function (e.g. OCR) in a worker thread once a slot is granted.
+        A cancelled caller still holds the slot until the thread finishes: the thread can't be
+        stopped, and releasing early would put a second job on the same (non thread-safe) engine.
+        """
+        async with self.slot(tenant, priority):
+            future = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                await future
+                raise
+
+    def metrics(self) -> Dict:
+        result = {
+            "capacity": self.capacity,
+            "tenant_limit": self.tenant_limit,
+            "reserved_interactive": self.reserved_interactive,
+            "running_by_tenant": dict(self._running_by_tenant),
+            "classes": {},
+        }
+        for priority in PRIORITIES:
+            depth_by_tenant = {
+                tenant: sum(1 for w in queue if not w.future.done())
+                for tenant, queue in self._queues[priority].items()
+            }
+            waits = sorted(self._waits[priority])
+            result["classes"][priority] = {
+                "queue_depth": sum(depth_by_tenant.values()),
+                "queue_depth_by_tenant": {t: d for t, d in depth_by_tenant.items() if d},
+                "running": self._running[priority],
+                "completed": self._completed[priority],
+                "wait_seconds": {
+                    "samples": len(waits),
+                    "avg": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                    "p50": round(waits[len(waits) // 2], 4) if waits else 0.0,
+                    "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4) if waits else 0.0,
+                    "max": round(waits[-1], 4) if waits else 0.0,
+                },
+            }
+        return result
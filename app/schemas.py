@@ -31,3 +31,15 @@ class InvoiceResponse(InvoiceBase):
 
     class Config:
         from_attributes = True
+
+class SearchHit(BaseModel):
+    id: int
+    filename: str
+    vendor_name: Optional[str] = None
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[str] = None
+    currency: Optional[str] = None
+    total: Optional[float] = None
+    validation_status: str
+    rank: float
+    snippet: str
@@ -0,0 +1,198 @@
+import os
+import re
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import models
+
+# Structured filters accepted by search(): name -> SQL condition on the invoices table (alias i)
+FILTERS = {
+    "vendor": "i.vendor_name = :vendor",
+    "currency": "i.currency = :currency",
+    "status": "i.validation_status = :status",
+    "date_from": "i.invoice_date >= :date_from",
+    "date_to": "i.invoice_date <= :date_to",
+    "min_total": "i.total >= :min_total",
+    "max_total": "i.total <= :max_total",
+}
+
+RESULT_COLUMNS = "i.id, i.filename, i.vendor_name, i.invoice_number, i.invoice_date, i.currency, i.total, i.validation_status"
+
+
+def query_terms(query: str) -> List[str]:
+    """Split a free-text query into plain terms. Punctuation ("INV-2023-001", "PO#4471") just separates terms."""
+    return re.findall(r"\w+", query)
+
+
+def query_phrases(query: str) -> List[List[str]]:
+    """
+    Split a query into phrases that must all match: quoted text is one phrase, and so is each
+    bare word, so the terms split out of "INV-2023-001" stay together. acme 4471 -> acme AND 4471;
+    "PO 4471" -> the phrase PO 4471.
+    """
+    phrases = []
+    for quoted, word in re.findall(r'"([^"]*)"?|(\S+)', query):
+        terms = query_terms(quoted or word)
+        if terms:
+            phrases.append(terms)
+    return phrases
+
+
+def phrase_pattern(terms: List[str]) -> re.Pattern:
+    """The terms as one phrase: whole words, in order, separated only by non-word characters (as FTS5 phrases match)."""
+    return re.compile(r"(?<!\w)" + r"\W+".join(re.escape(t) for t in terms) + r"(?!\w)", re.IGNORECASE)
+
+
+def save_invoice_text(session: Session, invoice_id: int, merged_lines: List[str]):
+    """Insert or replace an invoice's merged text. The index follows via the backend's triggers."""
+    session.merge(models.InvoiceText(invoice_id=invoice_id, content="\n".join(merged_lines)))
+
+
+class SearchBackend:
+    """Full-text search over invoice_texts, joined back to invoices for filters and results."""
+
+    def setup(self, engine):
+        pass
+
+    def _filters(self, filters: Dict[str, Any]):
+        clauses, params = [], {}
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name not in FILTERS:
+                raise ValueError(f"Unknown search filter: {name}")
+            clauses.append(FILTERS[name])
+            params[name] = value
+        return clauses, params
+
+    def search(self, session: Session, query: str, filters: Dict[str, Any] = None, limit: int = 20, offset: int = 0) -> List[Dict]:
+        raise NotImplementedError
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """
+    SQLite FTS5 index as an external-content table over invoice_texts: the text is stored
+    once, and triggers keep the index in sync on insert, update (re-extraction) and delete.
+    Ranked by bm25 (higher rank is better), with highlighted snippets.
+    """
+
+    DDL = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS invoice_fts USING fts5(
+            content, content='invoice_texts', content_rowid='invoice_id', tokenize='unicode61'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS invoice_texts_ai AFTER INSERT ON invoice_texts BEGIN
+            INSERT INTO invoice_fts(rowid, content) VALUES (new.invoice_id, new.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS invoice_texts_ad AFTER DELETE ON invoice_texts BEGIN
+            INSERT INTO invoice_fts(invoice_fts, rowid, content) VALUES ('delete', old.invoice_id, old.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS invoice_texts_au AFTER UPDATE ON invoice_texts BEGIN
+            INSERT INTO invoice_fts(invoice_fts, rowid, content) VALUES ('delete', old.invoice_id, old.content);
+            INSERT INTO invoice_fts(rowid, content) VALUES (new.invoice_id, new.content);
+        END""",
+    ]
+
+    def __init__(self, snippet_tokens: int = 12):
+        self.snippet_tokens = snippet_tokens
+
+    def setup(self, engine):
+        with engine.begin() as conn:
+            for statement in self.DDL:
+                conn.exec_driver_sql(statement)
+
+    def rebuild(self, engine):
+        """Rebuild the index from invoice_texts (e.g. after bulk loads that bypassed the triggers)."""
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO invoice_fts(invoice_fts) VALUES ('rebuild')")
+
+    def search(self, session: Session, query: str, filters: Dict[str, Any] = None, limit: int = 20, offset: int = 0) -> List[Dict]:
+        phrases = query_phrases(query)
+        if not phrases:
+            return []
+
+        clauses, params = self._filters(filters or {})
+        # Phrases keep "INV-2023-001" from matching INV-2023-555 ... 001 ... 2023; separate words are ANDed
+        params.update({
+            "match": " AND ".join('"' + " ".join(terms) + '"' for terms in phrases),
+            "limit": limit,
+            "offset": offset,
+        })
+        where = " AND ".join(["invoice_fts MATCH :match"] + clauses)
+
+        sql = f"""
+            SELECT {RESULT_COLUMNS},
+                   -invoice_fts.rank AS rank,
+                   snippet(invoice_fts, 0, '[', ']', '...', {int(self.snippet_tokens)}) AS snippet
+            FROM invoice_fts
+            JOIN invoices i ON i.id = invoice_fts.rowid
+            WHERE {where}
+            ORDER BY invoice_fts.rank
+            LIMIT :limit OFFSET :offset
+        """
+        return [dict(row._mapping) for row in session.execute(text(sql), params)]
+
+
+class LikeSearchBackend(SearchBackend):
+    """
+    Portable fallback for databases without a native full-text index: LIKE on every term
+    narrows the rows, then the phrases are checked in Python. Newest first, no relevance
+    ranking. Fine for small deployments only.
+    """
+
+    def __init__(self, snippet_chars: int = 60):
+        self.snippet_chars = snippet_chars
+
+    def _snippet(self, content: str, hit: int) -> str:
+        start = max(0, hit - self.snippet_chars // 2)
+        snippet = content[start:start + self.snippet_chars].replace("\n", " ")
+        return ("..." if start else "") + snippet + ("..." if start + self.snippet_chars < len(content) else "")
+
+    def search(self, session: Session, query: str, filters: Dict[str, Any] = None, limit: int = 20, offset: int = 0) -> List[Dict]:
+        phrases = query_phrases(query)
+        if not phrases:
+            return []
+        patterns = [phrase_pattern(terms) for terms in phrases]
+
+        clauses, params = self._filters(filters or {})
+        for n, term in enumerate(t for terms in phrases for t in terms):
+            clauses.append(f"LOWER(t.content) LIKE :term{n}")
+            params[f"term{n}"] = f"%{term.lower()}%"
+
+        sql = f"""
+            SELECT {RESULT_COLUMNS}, t.content
+            FROM invoice_texts t
+            JOIN invoices i ON i.id = t.invoice_id
+            WHERE {" AND ".join(clauses)}
+            ORDER BY i.id DESC
+        """
+        # Paginate after the phrase check, since LIKE alone over-matches
+        hits = []
+        skipped = 0
+        for row in session.execute(text(sql), params):
+            hit = dict(row._mapping)
+            content = hit.pop("content")
+            matches = [pattern.search(content) for pattern in patterns]
+            if None in matches:
+                continue
+            match = matches[0]
+            if skipped < offset:
+                skipped += 1
+                continue
+            hit["rank"] = 0.0
+            hit["snippet"] = self._snippet(content, match.start())
+            hits.append(hit)
+            if len(hits) == limit:
+                break
+        return hits
+
+
+def get_search_backend(engine, name: Optional[str] = None) -> SearchBackend:
+    """SEARCH_BACKEND=fts5|like. Defaults to FTS5 on SQLite, LIKE elsewhere."""
+    name = name or os.getenv("SEARCH_BACKEND") or ("fts5" if engine.dialect.name == "sqlite" else "like")
+    if name == "fts5":
+        return SQLiteFTS5Backend()
+    if name == "like":
+        return LikeSearchBackend()
+    raise ValueError(f"Unknown search backend: {name}")
@@ -0,0 +1,149 @@
+"""
+Linux production launcher.
+
+Loads the app (and with it the OCR model weights) once in the parent process, then forks
+uvicorn workers that share the weights copy-on-write instead of each loading their own copy.
+
+    python -m app.server --workers 4 --threads 2 --port 8000
+
+Workers x threads defaults to recommend_config() for the machine's core count.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+# Native thread pools read these once, at library load time
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "OCR_CPU_THREADS",
+]
+
+
+def recommend_config(cores: int = None):
+    """
+    Recommended (workers, threads_per_worker) for a core count.
+    OCR is mostly throughput-bound, so we prefer more single/dual-threaded workers over a few
+    wide ones: one thread per worker below 4 cores, two from there on (halving the worker
+    count, and with it per-worker memory, for little intra-op loss).
+    """
+    cores = cores or os.cpu_count() or 1
+    threads = 1 if cores < 4 else 2
+    workers = max(1, cores // threads)
+    return workers, threads
+
+
+def set_thread_limits(threads: int):
+    """Pin native thread pools so workers x threads does not oversubscribe the CPU."""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, log_level: str):
+    import uvicorn
+    from app.database import db
+
+    # Pooled connections opened by the parent must not be shared across processes
+    db.engine.dispose(close=False)
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main(argv=None):
+    default_workers, default_threads = recommend_config()
+
+    arg_parser = argparse.ArgumentParser(description="Smart Scan prefork server (Linux)")
+    arg_parser.add_argument("--host", default="0.0.0.0")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument("--workers", type=int, default=default_workers)
+    arg_parser.add_argument("--threads", type=int, default=default_threads, help="Native threads per worker")
+    arg_parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "INFO").lower())
+    args = arg_parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("app.server needs os.fork (Linux). Use run_server.bat on Windows.")
+
+    set_thread_limits(args.threads)
+
+    # Heavy import: builds the OCR engine and loads model weights (both tiers) once, before forking.
+    # No inference runs here - OpenMP pools used before fork() are not safe to reuse in children.
+    from app.main import app, ocr_engine
+    ocr_engine.load()
+
+    sock = bind_socket(args.host, args.port)
+
+    # Move everything allocated so far out of the GC's reach, so collections in the
+    # workers don't touch (and un-share) the parent's pages
+    gc.collect()
+    gc.freeze()
+
+    print(f"Starting {args.workers} workers x {args.threads} threads on {args.host}:{args.port}")
+
+    children = {}
+    shutting_down = False
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            # Lets the app pick one worker for singleton jobs (e.g. webhook delivery)
+            os.environ["SMARTSCAN_WORKER_SLOT"] = str(slot)
+            try:
+                run_worker(app, sock, args.log_level)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+
+    def stop(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for slot in range(args.workers):
+        spawn(slot)
+
+    # Supervise: respawn crashed workers until asked to stop
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        slot = children.pop(pid, None)
+        if slot is not None and not shutting_down:
+            print(f"Worker {pid} exited with status {status}, respawning")
+            time.sleep(1)
+            spawn(slot)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
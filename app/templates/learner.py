@@ -0,0 +1,169 @@
+import re
+from typing import List, Dict, Optional, Any, Union
+
+import numpy as np
+from dateutil import parser
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import models
+from app.ocr.document import OCRDocument
+from app.templates.store import VALUE_PATTERNS, AMOUNT_FIELDS, as_document, page_extents, relative_boxes, parse_amount
+
+# Preferred row keywords when an amount appears more than once on the page
+FIELD_KEYWORDS = {
+    "total": ["total", "amount due"],
+    "tax": ["tax", "vat", "gst"],
+    "subtotal": ["subtotal", "net total"],
+}
+
+
+class TemplateLearner:
+    """
+    Learns vendor templates from high-confidence scans.
+    For each extracted field we record where it sat on the page (relative region) and
+    the label text in front of it, turned into a regex.
+    """
+
+    def __init__(self, min_confidence: float = 0.9, region_padding: float = 0.02, max_patterns: int = 3, y_tolerance: int = 10):
+        self.min_confidence = min_confidence
+        self.region_padding = region_padding
+        self.max_patterns = max_patterns
+        self.y_tolerance = y_tolerance
+
+    def _value_matches(self, field: str, text: str, value: Any) -> Optional[re.Match]:
+        for match in re.finditer(VALUE_PATTERNS[field], text):
+            candidate = match.group(0)
+            if field in AMOUNT_FIELDS:
+                parsed = parse_amount(candidate)
+                if parsed is not None and abs(parsed - value) < 0.005:
+                    return match
+            elif field == "invoice_date":
+                try:
+                    if parser.parse(candidate).strftime("%Y-%m-%d") == value:
+                        return match
+                except (ValueError, OverflowError):
+                    continue
+            elif candidate == value:
+                return match
+        return None
+
+    def _row(self, doc: OCRDocument, anchor: int) -> np.ndarray:
+        """Indices of the boxes on the anchor's row, left of (and including) the anchor, in reading order."""
+        top_left = doc.boxes[:, 0]
+        x_left, y_top = top_left[anchor]
+        row = np.flatnonzero(
+            (doc.pages == doc.pages[anchor])
+            & (np.abs(top_left[:, 1] - y_top) <= self.y_tolerance)
+            & (top_left[:, 0] <= x_left)
+        )
+        return row[np.argsort(top_left[row, 0], kind="stable")]
+
+    def _locate(self, field: str, doc: OCRDocument, value: Any):
+        candidates = []
+        # Bottom-up, same as the generic totals search
+        for i in np.lexsort((doc.boxes[:, 0, 1], doc.pages))[::-1].tolist():
+            if not self._value_matches(field, doc.text(i), value):
+                continue
+            row = self._row(doc, i)
+            row_text = " ".join(doc.text(r) for r in row.tolist())
+            match = self._value_matches(field, row_text, value)
+            if not match:
+                continue
+            candidates.append((row, row_text, match))
+
+        if not candidates:
+            return None
+
+        keywords = FIELD_KEYWORDS.get(field)
+        if keywords:
+            for candidate in candidates:
+                if any(k in candidate[1].lower() for k in keywords):
+                    return candidate
+        return candidates[0]
+
+    def _pattern(self, field: str, row_text: str, match: re.Match) -> str:
+        prefix = re.sub(r"[\W_]+$", "", row_text[:match.start()])
+        label = " ".join(prefix.split()[-3:])
+        value = f"(?P<value>{VALUE_PATTERNS[field]})"
+        if not label:
+            return value
+        # Digits in labels vary between invoices (e.g. "Tax (8%)" vs "Tax (10%)")
+        label_re = re.sub(r"\d+", r"\\d+", re.escape(label))
+        return rf"(?<!\w){label_re}[^\w]*?{value}"
+
+    def _find(self, session: Session, vendor_name: str) -> Optional[models.VendorTemplate]:
+        return session.query(models.VendorTemplate).filter(models.VendorTemplate.vendor_name == vendor_name).first()
+
+    def learn(self, session: Session, vendor_name: str, raw_lines: Union[List[Dict], OCRDocument], data: Dict[str, Any], confidence: float) -> bool:
+        """
+        Fold one scan into the vendor's template. Adds to the session but does not commit.
+        Returns True if the template changed (callers should invalidate the TemplateStore after commit).
+        """
+        if not vendor_name or not len(raw_lines) or confidence < self.min_confidence:
+            return False
+        doc = as_document(raw_lines)
+
+        extents = page_extents(doc)
+        relative = relative_boxes(doc, extents)
+        last_page = max(extents)
+        learned = {}
+
+        for field in VALUE_PATTERNS:
+            value = data.get(field)
+            if value is None or value == "":
+                continue
+            located = self._locate(field, doc, value)
+            if not located:
+                continue
+            row, row_text, match = located
+
+            boxes = relative[row]
+            region = [
+                max(0.0, float(boxes[:, 0].min()) - self.region_padding),
+                max(0.0, float(boxes[:, 1].min()) - self.region_padding),
+                min(1.0, float(boxes[:, 2].max()) + self.region_padding),
+                min(1.0, float(boxes[:, 3].max()) + self.region_padding),
+            ]
+            page = int(doc.pages[row[0]])
+            learned[field] = {
+                "page": -1 if page == last_page and page != 1 else page,
+                "region": region,
+                "pattern": self._pattern(field, row_text, match),
+            }
+
+        if not learned:
+            return False
+
+        template = self._find(session, vendor_name)
+        if template is None:
+            # Another worker may insert the same vendor first; the savepoint keeps a unique
+            # violation from rolling back the caller's invoice along with it
+            try:
+                with session.begin_nested():
+                    template = models.VendorTemplate(vendor_name=vendor_name, fields={}, samples=0)
+                    session.add(template)
+            except IntegrityError:
+                template = self._find(session, vendor_name)
+
+        fields = dict(template.fields or {})
+        for field, spec in learned.items():
+            existing = fields.get(field)
+            if existing is None or existing.get("page") != spec["page"]:
+                fields[field] = {"page": spec["page"], "region": spec["region"], "patterns": [spec["pattern"]]}
+                continue
+
+            # Grow the region to cover every sample, keep the most recent distinct patterns
+            old = existing["region"]
+            new = spec["region"]
+            patterns = [spec["pattern"]] + [p for p in existing.get("patterns", []) if p != spec["pattern"]]
+            fields[field] = {
+                "page": spec["page"],
+                "region": [min(old[0], new[0]), min(old[1], new[1]), max(old[2], new[2]), max(old[3], new[3])],
+                "patterns": patterns[:self.max_patterns],
+            }
+
+        # Reassign so SQLAlchemy picks up the JSON change
+        template.fields = fields
+        template.samples = (template.samples or 0) + 1
+        return True
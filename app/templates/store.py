@@ -0,0 +1,166 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any, Union
+
+import numpy as np
+from dateutil import parser
+from sqlalchemy.orm import Session
+
+from app.database import models
+from app.ocr.document import OCRDocument
+
+# Value shapes per templated field. Learned label regexes are prefixed to these.
+VALUE_PATTERNS = {
+    "invoice_number": r"[A-Za-z0-9\-\/]+",
+    "invoice_date": r"[0-9]{1,4}[/\-\.][0-9]{1,2}[/\-\.][0-9]{1,4}|[0-9]{1,2}\s+[A-Za-z]{3,}\s+[0-9]{4}|[A-Za-z]{3,}\s+[0-9]{1,2},?\s+[0-9]{4}",
+    "subtotal": r"[\d,]*\.?\d+",
+    "tax": r"[\d,]*\.?\d+",
+    "total": r"[\d,]*\.?\d+",
+}
+
+AMOUNT_FIELDS = ("subtotal", "tax", "total")
+
+
+def as_document(raw_lines: Union[List[Dict], OCRDocument]) -> OCRDocument:
+    return raw_lines if isinstance(raw_lines, OCRDocument) else OCRDocument.from_lines(raw_lines)
+
+
+def page_extents(doc: OCRDocument) -> Dict[int, tuple]:
+    """Max (x, y) seen on each page (at least 1.0), used to normalize boxes to 0.0 - 1.0."""
+    extents = {}
+    max_xy = doc.boxes.max(axis=1)
+    for page in doc.page_numbers:
+        page_max = max_xy[doc.pages == page].max(axis=0)
+        extents[page] = (max(1.0, float(page_max[0])), max(1.0, float(page_max[1])))
+    return extents
+
+
+def relative_boxes(doc: OCRDocument, extents: Dict[int, tuple]) -> np.ndarray:
+    """(n, 4) array of [x0, y0, x1, y1] per line, relative to its page's extent."""
+    pages = np.array(sorted(extents), dtype=np.int32)
+    sizes = np.array([extents[page] for page in pages.tolist()], dtype=np.float64).reshape(-1, 2)
+    size = sizes[np.searchsorted(pages, doc.pages)]
+    boxes = doc.boxes.astype(np.float64)
+    return np.concatenate([boxes.min(axis=1) / size, boxes.max(axis=1) / size], axis=1)
+
+
+def parse_amount(text: str) -> Optional[float]:
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return None
+
+
+class CompiledTemplate:
+    """A vendor template with its regexes compiled, ready to run against OCR lines."""
+
+    def __init__(self, vendor_name: str, fields: Dict[str, Any]):
+        self.vendor_name = vendor_name
+        self.fields = {}
+        for field, spec in fields.items():
+            self.fields[field] = {
+                "page": spec.get("page", 1),
+                "region": spec["region"],
+                "patterns": [re.compile(p, re.IGNORECASE) for p in spec.get("patterns", [])],
+            }
+
+    def _region_text(self, doc: OCRDocument, boxes: np.ndarray, page: int, region: List[float]) -> str:
+        x0, y0, x1, y1 = region
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        hits = np.flatnonzero((doc.pages == page) & (x0 <= cx) & (cx <= x1) & (y0 <= cy) & (cy <= y1))
+        # Reading order within the region: top edge, then left edge
+        hits = hits[np.lexsort((boxes[hits, 0], boxes[hits, 1]))]
+        return " ".join(doc.text(i) for i in hits.tolist())
+
+    def apply(self, raw_lines: Union[List[Dict], OCRDocument], last_page: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Extract templated fields by region lookup.
+        Only fields that matched are returned; callers fall back to the generic extractors for the rest.
+        last_page: the document's page count when raw_lines only cover some pages (incremental scans).
+        """
+        if not len(raw_lines):
+            return {}
+        doc = as_document(raw_lines)
+
+        extents = page_extents(doc)
+        boxes = relative_boxes(doc, extents)
+        last_page = last_page or max(extents)
+        results = {}
+
+        for field, spec in self.fields.items():
+            page = last_page if spec["page"] == -1 else spec["page"]
+            if page not in extents:
+                continue
+            text = self._region_text(doc, boxes, page, spec["region"])
+            if not text:
+                continue
+
+            for pattern in spec["patterns"]:
+                matches = list(pattern.finditer(text))
+                if not matches:
+                    continue
+                raw_value = matches[-1].group("value").strip()
+
+                if field in AMOUNT_FIELDS:
+                    value = parse_amount(raw_value)
+                elif field == "invoice_date":
+                    try:
+                        value = parser.parse(raw_value).strftime("%Y-%m-%d")
+                    except (ValueError, OverflowError):
+                        value = None
+                else:
+                    value = raw_value
+
+                if value is not None:
+                    results[field] = value
+                    break
+
+        return results
+
+
+class TemplateStore:
+    """
+    In-memory LRU cache of compiled vendor templates, backed by the vendor_templates table.
+    Misses are cached too, so unknown vendors only cost one query until evicted.
+
+    Entries expire after `ttl` seconds (TEMPLATE_CACHE_TTL). invalidate() only reaches this
+    process, so the TTL is what lets other workers pick up templates learned elsewhere.
+    """
+
+    def __init__(self, capacity: int = None, min_samples: int = None, ttl: float = None):
+        self.capacity = capacity or int(os.getenv("TEMPLATE_CACHE_SIZE", "256"))
+        self.min_samples = min_samples or int(os.getenv("TEMPLATE_MIN_SAMPLES", "2"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("TEMPLATE_CACHE_TTL", "60"))
+        self._cache = OrderedDict()  # vendor -> (expires_at, CompiledTemplate or None)
+        self._lock = threading.Lock()
+
+    def get(self, session: Session, vendor_name: str) -> Optional[CompiledTemplate]:
+        if not vendor_name:
+            return None
+
+        with self._lock:
+            entry = self._cache.get(vendor_name)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(vendor_name)
+                return entry[1]
+
+        row = session.query(models.VendorTemplate).filter(models.VendorTemplate.vendor_name == vendor_name).first()
+        compiled = None
+        if row is not None and row.samples >= self.min_samples and row.fields:
+            compiled = CompiledTemplate(row.vendor_name, row.fields)
+
+        with self._lock:
+            self._cache[vendor_name] = (time.monotonic() + self.ttl, compiled)
+            self._cache.move_to_end(vendor_name)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+        return compiled
+
+    def invalidate(self, vendor_name: str):
+        with self._lock:
+            self._cache.pop(vendor_name, None)
@@ -0,0 +1,129 @@
+"""
+Bulk (nightly) validation of every stored invoice:
+
+    python -m app.validation.bulk --chunk-size 10000
+
+Refreshes vendor_stats, then walks the invoices table in id order, one chunk at a time,
+evaluating the rule set column-wise. Failed rules replace the chunk's rows in
+validation_results; invoices whose validation_status flips get an invoice.validation_changed
+outbox event in the same transaction.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from datetime import date
+from typing import Dict, Any
+
+import numpy as np
+
+from app.database import models, db
+from app.events.outbox import OutboxNotifier, record_event, PAYLOAD_FIELDS, VALIDATION_CHANGED
+from app.validation.rules import RuleEngine, RuleContext, ERROR, line_items_sum
+from app.validation.stats import compute_vendor_stats, load_vendor_stats
+
+NUMERIC_FIELDS = ("subtotal", "tax", "total", "confidence_score")
+
+
+class BulkValidator:
+    def __init__(self, session_factory, engine: RuleEngine, chunk_size: int = None, notifier: OutboxNotifier = None, today: date = None):
+        self.session_factory = session_factory
+        self.engine = engine
+        self.chunk_size = chunk_size or int(os.getenv("VALIDATION_CHUNK_SIZE", "10000"))
+        self.notifier = notifier
+        self.today = today
+
+    def _columns(self, rows) -> Dict[str, np.ndarray]:
+        cols = {}
+        for field, values in zip(PAYLOAD_FIELDS, zip(*rows)):
+            if field == "line_items":
+                cols["line_items_sum"] = np.array([line_items_sum(items) for items in values], dtype=float)
+            elif field == "id":
+                cols["id"] = np.array(values, dtype=np.int64)
+            elif field in NUMERIC_FIELDS:
+                cols[field] = np.array(values, dtype=float)  # None -> NaN
+            else:
+                cols[field] = np.array(values, dtype=object)
+        return cols
+
+    def _validate_chunk(self, session, rows, ctx: RuleContext, summary: Dict[str, Any]):
+        cols = self._columns(rows)
+        masks = self.engine.evaluate_columns(cols, ctx)
+
+        invalid = np.zeros(len(rows), dtype=bool)
+        results = []
+        errors = {}
+        for rule in self.engine.rules:
+            mask = masks[rule.name]
+            if rule.severity == ERROR:
+                invalid |= mask
+            failing = np.flatnonzero(mask)
+            summary["failures"][rule.name] += len(failing)
+            # Messages are only built for failing rows
+            for i in failing.tolist():
+                row = rows[i]
+                values = dict(row._asdict(), line_items_sum=float(cols["line_items_sum"][i]))
+                message = rule.format(rule.row_values(values, ctx))
+                results.append({"invoice_id": row.id, "rule": rule.name, "severity": rule.severity, "message": message})
+                if rule.severity == ERROR:
+                    errors.setdefault(i, []).append(message)
+
+        status = np.where(invalid, "INVALID", "VALID")
+        changed = np.flatnonzero(cols["validation_status"] != status)
+
+        session.query(models.ValidationResult).filter(
+            models.ValidationResult.invoice_id.between(rows[0].id, rows[-1].id)
+        ).delete(synchronize_session=False)
+        session.bulk_insert_mappings(models.ValidationResult, results)
+        session.bulk_update_mappings(models.Invoice, [{"id": rows[i].id, "validation_status": str(status[i])} for i in changed.tolist()])
+        for i in changed.tolist():
+            record_event(session, VALIDATION_CHANGED, rows[i], validation_status=str(status[i]), previous_status=rows[i].validation_status, errors=errors.get(i, []))
+        session.commit()
+
+        summary["invoices"] += len(rows)
+        summary["status_changed"] += len(changed)
+
+    def run(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        summary = {"invoices": 0, "status_changed": 0, "failures": Counter(), "vendors": 0}
+        columns = [getattr(models.Invoice, field) for field in PAYLOAD_FIELDS]
+
+        session = self.session_factory()
+        try:
+            summary["vendors"] = compute_vendor_stats(session)
+            ctx = RuleContext(self.today, load_vendor_stats(session))
+            for rule in self.engine.rules:
+                rule.prepare(session, ctx)
+
+            # Keyset pagination: each chunk is one indexed range scan, however deep into the table
+            last_id = 0
+            while True:
+                rows = session.query(*columns).filter(models.Invoice.id > last_id).order_by(models.Invoice.id).limit(self.chunk_size).all()
+                if not rows:
+                    break
+                self._validate_chunk(session, rows, ctx, summary)
+                last_id = rows[-1].id
+                if self.notifier is not None:
+                    self.notifier.notify()
+        finally:
+            session.close()
+
+        summary["failures"] = dict(summary["failures"])
+        summary["seconds"] = round(time.perf_counter() - start, 3)
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate all stored invoices against the rule set.")
+    parser.add_argument("--rules", default="data/validation_rules.json")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=db.engine)
+    validator = BulkValidator(db.SessionLocal, RuleEngine.from_file(args.rules), chunk_size=args.chunk_size)
+    print(json.dumps(validator.run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
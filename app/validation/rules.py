@@ -0,0 +1,301 @@
+import json
+import math
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import models
+
+ERROR = "error"
+WARNING = "warning"
+
+
+def _missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def line_items_sum(line_items) -> Optional[float]:
+    """Sum of line item amounts, None when no item has an amount."""
+    amounts = [item.get("amount") for item in line_items or [] if isinstance(item, dict) and item.get("amount") is not None]
+    return float(sum(amounts)) if amounts else None
+
+
+def _as_dates(values: np.ndarray) -> np.ndarray:
+    """YYYY-MM-DD strings -> datetime64[D], NaT for missing or unparseable values."""
+    try:
+        return np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        out = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[D]")
+        for i, value in enumerate(values):
+            try:
+                out[i] = np.datetime64(value, "D")
+            except (ValueError, TypeError):
+                pass
+        return out
+
+
+class RuleContext:
+    """
+    What rules may need beyond the invoice itself.
+
+    vendor_stats: vendor name -> {"samples", "mean", "std"} (see VendorStatsCache)
+    session: inline mode, for rules that look at stored invoices (e.g. duplicates); optional
+    extra: per-rule data set up by Rule.prepare in bulk mode (e.g. duplicate ids)
+    """
+
+    def __init__(self, today: date = None, vendor_stats=None, session: Session = None):
+        self.today = today or date.today()
+        self.vendor_stats = vendor_stats if vendor_stats is not None else {}
+        self.session = session
+        self.extra = {}
+
+
+class Rule:
+    """
+    One declarative check. Subclasses implement both modes:
+
+    - check(data, ctx): inline, one extracted invoice dict -> message values if it fails, else None
+    - check_columns(cols, ctx): bulk, column arrays for a chunk of invoices -> boolean "fails" mask
+
+    Column arrays: numeric fields are float (NaN = missing), text fields are object arrays.
+    """
+
+    type = None
+    inline = True
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.name = spec["name"]
+        self.message = spec["message"]
+        self.severity = spec.get("severity", ERROR)
+
+    def prepare(self, session: Session, ctx: RuleContext):
+        """Bulk mode: set-level work (SQL aggregates) before the chunks are evaluated."""
+
+    def check(self, data: Dict[str, Any], ctx: RuleContext) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def check_columns(self, cols: Dict[str, np.ndarray], ctx: RuleContext) -> np.ndarray:
+        raise NotImplementedError
+
+    def row_values(self, row: Dict[str, Any], ctx: RuleContext) -> Dict[str, Any]:
+        """Message values for a failing row in bulk mode."""
+        return row
+
+    def format(self, values: Dict[str, Any]) -> str:
+        return self.message.format(**values)
+
+
+class RequiredRule(Rule):
+    type = "required"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.field = spec["field"]
+
+    def check(self, data, ctx):
+        return None if data.get(self.field) else data
+
+    def check_columns(self, cols, ctx):
+        col = cols[self.field]
+        if col.dtype == object:
+            return np.equal(col, None) | (col == "")
+        return np.isnan(col) | (col == 0)
+
+
+class SumEqualsRule(Rule):
+    type = "sum_equals"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.fields = spec["fields"]
+        self.target = spec["target"]
+        self.tolerance = spec.get("tolerance", 0.05)
+
+    def check(self, data, ctx):
+        values = [data.get(f) for f in self.fields + [self.target]]
+        if any(_missing(v) for v in values):
+            return None
+        return data if abs(sum(values[:-1]) - values[-1]) > self.tolerance else None
+
+    def check_columns(self, cols, ctx):
+        # NaN anywhere -> comparison is False, so incomplete rows pass like they do inline
+        total = sum(cols[f] for f in self.fields)
+        return np.abs(total - cols[self.target]) > self.tolerance
+
+
+class LineItemsSumRule(Rule):
+    type = "line_items_sum"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.target = spec["target"]
+        self.tolerance = spec.get("tolerance", 0.05)
+
+    def check(self, data, ctx):
+        items_sum = line_items_sum(data.get("line_items"))
+        target = data.get(self.target)
+        if items_sum is None or _missing(target) or abs(items_sum - target) <= self.tolerance:
+            return None
+        return dict(data, line_items_sum=round(items_sum, 2))
+
+    def check_columns(self, cols, ctx):
+        return np.abs(cols["line_items_sum"] - cols[self.target]) > self.tolerance
+
+    def row_values(self, row, ctx):
+        return dict(row, line_items_sum=round(row["line_items_sum"], 2))
+
+
+class NotFutureRule(Rule):
+    type = "not_future"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.field = spec["field"]
+        self.grace_days = spec.get("grace_days", 0)
+
+    def check(self, data, ctx):
+        value = data.get(self.field)
+        if not value:
+            return None
+        try:
+            day = date.fromisoformat(value)
+        except (ValueError, TypeError):
+            return None
+        return data if day > ctx.today + timedelta(days=self.grace_days) else None
+
+    def check_columns(self, cols, ctx):
+        limit = np.datetime64(ctx.today + timedelta(days=self.grace_days), "D")
+        return _as_dates(cols[self.field]) > limit
+
+
+class UniquePerRule(Rule):
+    """
+    Duplicate `field` within `group` (e.g. invoice number per vendor).
+    The first invoice (lowest id) of each group is the original; only the later ones fail.
+    Inline, an invoice about to be stored fails if one is stored already (needs ctx.session).
+    """
+
+    type = "unique_per"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.field = spec["field"]
+        self.group = spec["group"]
+
+    def prepare(self, session, ctx):
+        field = getattr(models.Invoice, self.field)
+        group = getattr(models.Invoice, self.group)
+        dupes = (
+            session.query(group.label("g"), field.label("f"), func.min(models.Invoice.id).label("first"))
+            .filter(field.isnot(None), field != "", group.isnot(None))
+            .group_by(group, field)
+            .having(func.count(models.Invoice.id) > 1)
+            .subquery()
+        )
+        ids = (
+            session.query(models.Invoice.id)
+            .join(dupes, (group == dupes.c.g) & (field == dupes.c.f))
+            .filter(models.Invoice.id > dupes.c.first)
+        )
+        ctx.extra[self.name] = np.array(sorted(i for (i,) in ids), dtype=np.int64)
+
+    def check(self, data, ctx):
+        value, group = data.get(self.field), data.get(self.group)
+        if ctx.session is None or not value or group is None:
+            return None
+        exists = ctx.session.query(
+            ctx.session.query(models.Invoice.id)
+            .filter(getattr(models.Invoice, self.field) == value, getattr(models.Invoice, self.group) == group)
+            .exists()
+        ).scalar()
+        return data if exists else None
+
+    def check_columns(self, cols, ctx):
+        return np.isin(cols["id"], ctx.extra.get(self.name, np.empty(0, dtype=np.int64)))
+
+
+class VendorRangeRule(Rule):
+    """`field` outside mean +- k * std of the vendor's history (at least min_spread * mean wide)."""
+
+    type = "vendor_range"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.field = spec["field"]
+        self.min_samples = spec.get("min_samples", 5)
+        self.k = spec.get("k", 4.0)
+        self.min_spread = spec.get("min_spread", 0.1)
+
+    def bounds(self, vendor, ctx):
+        stats = ctx.vendor_stats.get(vendor) if vendor else None
+        if not stats or stats["samples"] < self.min_samples:
+            return None
+        half = max(self.k * stats["std"], self.min_spread * abs(stats["mean"]))
+        return stats["mean"] - half, stats["mean"] + half
+
+    def check(self, data, ctx):
+        value = data.get(self.field)
+        bounds = self.bounds(data.get("vendor_name"), ctx)
+        if _missing(value) or bounds is None or bounds[0] <= value <= bounds[1]:
+            return None
+        return dict(data, low=round(bounds[0], 2), high=round(bounds[1], 2))
+
+    def check_columns(self, cols, ctx):
+        # Bounds are looked up once per distinct vendor in the chunk, then broadcast back
+        vendors = np.where(np.equal(cols["vendor_name"], None), "", cols["vendor_name"]).astype(str)
+        unique, inverse = np.unique(vendors, return_inverse=True)
+        low = np.full(len(unique), -np.inf)
+        high = np.full(len(unique), np.inf)
+        for i, vendor in enumerate(unique):
+            bounds = self.bounds(vendor, ctx)
+            if bounds is not None:
+                low[i], high[i] = bounds
+        values = cols[self.field]
+        return (values < low[inverse]) | (values > high[inverse])
+
+    def row_values(self, row, ctx):
+        low, high = self.bounds(row["vendor_name"], ctx)
+        return dict(row, low=round(low, 2), high=round(high, 2))
+
+
+RULE_TYPES = {cls.type: cls for cls in (RequiredRule, SumEqualsRule, LineItemsSumRule, NotFutureRule, UniquePerRule, VendorRangeRule)}
+
+
+def load_rules(path: str = "data/validation_rules.json") -> List[Rule]:
+    with open(path) as f:
+        specs = json.load(f)["rules"]
+    rules = []
+    for spec in specs:
+        if spec["type"] not in RULE_TYPES:
+            raise ValueError(f"Unknown rule type: {spec['type']}")
+        rules.append(RULE_TYPES[spec["type"]](spec))
+    return rules
+
+
+class RuleEngine:
+    """Runs a rule set inline (one invoice dict) or column-wise (a chunk of stored invoices)."""
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+
+    @classmethod
+    def from_file(cls, path: str = "data/validation_rules.json"):
+        return cls(load_rules(path))
+
+    def evaluate(self, data: Dict[str, Any], ctx: RuleContext = None) -> Dict[str, Any]:
+        ctx = ctx or RuleContext()
+        errors, warnings = [], []
+        for rule in self.rules:
+            if not rule.inline:
+                continue
+            values = rule.check(data, ctx)
+            if values is not None:
+                (errors if rule.severity == ERROR else warnings).append(rule.format(values))
+        return {"is_valid": not errors, "errors": errors, "warnings": warnings}
+
+    def evaluate_columns(self, cols: Dict[str, np.ndarray], ctx: RuleContext) -> Dict[str, np.ndarray]:
+        """Rule name -> boolean mask of rows failing it."""
+        return {rule.name: rule.check_columns(cols, ctx) for rule in self.rules}
@@ -0,0 +1,86 @@
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import models
+
+
+def compute_vendor_stats(session: Session) -> int:
+    """
+    Recompute vendor_stats from the invoices table in one GROUP BY (no rows leave the database).
+    Std is derived from avg(x) and avg(x^2). Commits; returns the number of vendors.
+    """
+    total = models.Invoice.total
+    rows = (
+        session.query(
+            models.Invoice.vendor_name,
+            func.count(total),
+            func.avg(total),
+            func.avg(total * total),
+            func.min(total),
+            func.max(total),
+        )
+        .filter(models.Invoice.vendor_name.isnot(None), total.isnot(None))
+        .group_by(models.Invoice.vendor_name)
+        .all()
+    )
+
+    session.query(models.VendorStats).delete()
+    session.bulk_insert_mappings(models.VendorStats, [
+        {
+            "vendor_name": vendor,
+            "samples": samples,
+            "mean_total": mean,
+            "std_total": math.sqrt(max(0.0, mean_sq - mean * mean)),
+            "min_total": low,
+            "max_total": high,
+        }
+        for vendor, samples, mean, mean_sq, low, high in rows
+    ])
+    session.commit()
+    return len(rows)
+
+
+def load_vendor_stats(session: Session) -> Dict[str, Dict[str, float]]:
+    return {
+        row.vendor_name: {"samples": row.samples, "mean": row.mean_total, "std": row.std_total}
+        for row in session.query(models.VendorStats).all()
+    }
+
+
+class VendorStatsCache:
+    """
+    In-memory copy of vendor_stats for inline validation, reloaded at most every `ttl` seconds
+    (VENDOR_STATS_TTL). The table itself is refreshed by the bulk validation run.
+    """
+
+    def __init__(self, session_factory, ttl: float = None):
+        self.session_factory = session_factory
+        self.ttl = ttl if ttl is not None else float(os.getenv("VENDOR_STATS_TTL", "3600"))
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            session = self.session_factory()
+            try:
+                self._stats = load_vendor_stats(session)
+            finally:
+                session.close()
+            self._loaded_at = time.monotonic()
+
+    def get(self, vendor_name: str) -> Optional[Dict[str, float]]:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+            self._refresh()
+        return self._stats.get(vendor_name)
+
+    def invalidate(self):
+        self._loaded_at = None
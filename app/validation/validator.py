@@ -1,43 +1,21 @@
 from typing import Dict, Any
 
+from sqlalchemy.orm import Session
+
+from app.validation.rules import RuleEngine, RuleContext
+
 class Validator:
-    def __init__(self):
-        # Strict tolerance for math checks (e.g. 0.05 currency units)
-        self.math_tolerance = 0.05 
+    def __init__(self, rules_path: str = "data/validation_rules.json", vendor_stats=None):
+        # Declarative rule set, shared with the bulk validator (app.validation.bulk)
+        self.engine = RuleEngine.from_file(rules_path)
+        # VendorStatsCache (or any vendor -> stats mapping) for the vendor range rule
+        self.vendor_stats = vendor_stats
 
-    def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def validate(self, data: Dict[str, Any], session: Session = None) -> Dict[str, Any]:
         """
-        Run validation rules on extracted data.
-        Returns a dict with 'is_valid' (bool) and 'errors' (list[str]).
+        Run the inline validation rules on extracted data.
+        Returns a dict with 'is_valid' (bool), 'errors' (list[str]) and 'warnings' (list[str]).
+        Only errors make an invoice invalid.
+        session: checks against stored invoices (duplicate numbers) only run when given.
         """
-        errors = []
-        
-        # 1. Required Fields Check
-        required_fields = ["vendor_name", "invoice_date", "total"]
-        if not data.get("invoice_number"):
-            # Invoice number is critical but sometimes missing on weird receipts. 
-            # We'll mark it as error if missing.
-            errors.append("Missing invoice number")
-            
-        for field in required_fields:
-            if not data.get(field):
-                errors.append(f"Missing required field: {field}")
-
-        # 2. Math Validation (Subtotal + Tax = Total)
-        subtotal = data.get("subtotal")
-        tax = data.get("tax")
-        total = data.get("total")
-
-        if subtotal is not None and tax is not None and total is not None:
-            calculated_total = subtotal + tax
-            if abs(calculated_total - total) > self.math_tolerance:
-                errors.append(f"Math mismatch: Subtotal ({subtotal}) + Tax ({tax}) != Total ({total})")
-        
-        # 3. Currency Consistency (Simple check if currency is extracted)
-        if not data.get("currency"):
-             errors.append("Missing currency")
-
-        return {
-            "is_valid": len(errors) == 0,
-            "errors": errors
-        }
+        return self.engine.evaluate(data, RuleContext(vendor_stats=self.vendor_stats, session=session))
@@ -0,0 +1,146 @@
+"""
+Compare memory and throughput of app.server across workers x threads configurations.
+
+    python benchmarks/bench_workers.py invoice.jpg --requests 40 --configs 1x4 2x2 4x1
+
+For each configuration the server is started on a fresh database, warmed up, then hit with
+concurrent /scan uploads. Memory is reported as total RSS (counts shared pages once per
+process) and total PSS (shared pages split between processes - the real footprint).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.getcwd())
+from app.server import recommend_config
+
+
+def process_tree(pid):
+    pids = [pid]
+    children_path = f"/proc/{pid}/task/{pid}/children"
+    if os.path.exists(children_path):
+        with open(children_path) as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    return pids
+
+
+def memory_kb(pid):
+    """(rss_kb, pss_kb) summed over the process tree rooted at pid."""
+    rss = pss = 0
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except FileNotFoundError:
+            continue
+    return rss, pss
+
+
+def wait_ready(url, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/docs", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("Server did not come up")
+
+
+def scan(url, content, filename, mime_type, i):
+    # Trailing bytes keep every upload unique, so the dedup check doesn't short-circuit OCR
+    payload = content + f"\n{i}-{time.time_ns()}".encode()
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {mime_type}\r\n\r\n"
+    ).encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(
+        f"{url}/scan", data=body, method="POST", headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run_config(file_path, workers, threads, n_requests, port):
+    with open(file_path, "rb") as f:
+        content = f.read()
+    filename = os.path.basename(file_path)
+    mime_type = "application/pdf" if filename.lower().endswith(".pdf") else "image/jpeg"
+    url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--threads", str(threads), "--log-level", "warning"],
+            env=env,
+        )
+        try:
+            wait_ready(url)
+            idle_rss, idle_pss = memory_kb(server.pid)
+
+            # Warm-up: one request per worker so every worker has run inference once
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(lambda i: scan(url, content, filename, mime_type, i), range(-workers, 0)))
+
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+                statuses = list(pool.map(lambda i: scan(url, content, filename, mime_type, i), range(n_requests)))
+            duration = time.time() - start
+
+            rss, pss = memory_kb(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "config": f"{workers}x{threads}",
+        "ok": sum(1 for s in statuses if s == 200),
+        "throughput": n_requests / duration,
+        "idle_rss_mb": idle_rss / 1024,
+        "idle_pss_mb": idle_pss / 1024,
+        "rss_mb": rss / 1024,
+        "pss_mb": pss / 1024,
+    }
+
+
+def main():
+    recommended = "{}x{}".format(*recommend_config())
+
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("file", help="Invoice to upload (PDF/PNG/JPEG)")
+    arg_parser.add_argument("--requests", type=int, default=40)
+    arg_parser.add_argument("--configs", nargs="+", default=["1x1", recommended], help="WORKERSxTHREADS")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    args = arg_parser.parse_args()
+
+    print(f"Cores: {os.cpu_count()}, recommended: {recommended}")
+    print(f"{'config':>8} {'ok':>4} {'req/s':>8} {'idle RSS':>10} {'idle PSS':>10} {'RSS':>10} {'PSS':>10}")
+    for config in args.configs:
+        workers, threads = (int(v) for v in config.lower().split("x"))
+        r = run_config(args.file, workers, threads, args.requests, args.port)
+        print(f"{r['config']:>8} {r['ok']:>4} {r['throughput']:>8.2f} {r['idle_rss_mb']:>9.0f}M "
+              f"{r['idle_pss_mb']:>9.0f}M {r['rss_mb']:>9.0f}M {r['pss_mb']:>9.0f}M")
+
+
+if __name__ == "__main__":
+    main()
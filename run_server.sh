@@ -0,0 +1,6 @@
+#!/usr/bin/env sh
+# Production launcher (Linux): loads models once, then forks workers sharing them.
+# Workers/threads default to a recommendation for this machine; override with
+# e.g. ./run_server.sh --workers 4 --threads 2
+echo "Starting Smart Scan Server..."
+exec python -m app.server "$@"
@@ -0,0 +1,39 @@
+import sys
+import os
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.extractors.currency import CurrencyExtractor
+
+extractor = CurrencyExtractor()
+
+
+def test_symbols_and_codes_ranked_by_amount_context():
+    assert extractor.detect(["Subtotal: $100.00", "Tax: $10.00", "Total: $110.00"]) == ("USD", 1.0)
+    # An explicit code next to the total claims the ambiguous "$" signs
+    assert extractor.extract(["Subtotal: $100.00", "Tax: $10.00", "Total: $110.00 CAD"]) == "CAD"
+    # Longest symbol wins; the code table covers more than the old handful of currencies
+    assert extractor.extract(["NZ$ 45.00 Total"]) == "NZD"
+    assert extractor.extract(["Amount due 12,500.00 INR"]) == "INR"
+    assert extractor.extract(["Betrag: 100,00 €", "Gesamt 119,00 €"]) == "EUR"
+
+
+def test_no_silent_default_and_no_false_hits():
+    assert extractor.detect(["Thank you for your business"]) == (None, 0.0)
+    # Codes inside URLs / e-mails, inside words, or capitalized words far from any amount
+    lines = ["Visit https://shop.example.com/usd", "billing@acme-eur.com", "MUSDE", "ALL PRICES INCLUDE VAT", "Total: 99.00"]
+    assert extractor.extract(lines) is None
+
+    # A matching extracted amount pulls its line's currency ahead
+    lines = ["Ref GBP 12.00", "EUR 250.00"]
+    assert extractor.extract(lines, amounts=[250.0]) == "EUR"
+
+
+def test_codes_that_are_words_need_an_amount_on_a_total_line():
+    # The line holds the extracted total, but "ALL" is a word there, not a currency
+    assert extractor.detect(["ALL ITEMS 25.00", "Total 25.00"], [25.0]) == (None, 0.0)
+    # Line items mentioning pens and tops don't water down the "$" total
+    lines = ["TOP SHEET 1.50", "BLUE PEN 2.50", "Total: $4.00"]
+    assert extractor.detect(lines, [4.0]) == extractor.detect(["Total: $4.00"], [4.0]) == ("USD", 1.0)
+    # Next to the amount on a total line they still count
+    assert extractor.extract(["Total: 25.00 PEN"], amounts=[25.0]) == "PEN"
@@ -0,0 +1,60 @@
+import sys
+import os
+import tempfile
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import numpy as np
+
+from app.ocr.document import OCRDocument
+from app.preprocessing.cleaner import TextCleaner
+
+LINES = [
+    {"text": "ACME CORP", "box": [[10, 10], [100, 10], [100, 30], [10, 30]], "confidence": 0.99, "page": 1},
+    {"text": "INVOICE", "box": [[200, 12], [280, 12], [280, 30], [200, 30]], "confidence": 0.99, "page": 1},
+    {"text": "Invoice No: INV-2023-001", "box": [[200, 40], [350, 40], [350, 60], [200, 60]], "confidence": 0.95, "page": 1},
+    {"text": "Prix unitaire €", "box": [[10, 230], [100, 230], [100, 250], [10, 250]], "confidence": 0.9, "page": 2},
+    {"text": "Total: $110.00", "box": [[250, 460], [350, 460], [350, 480], [250, 480]], "confidence": 0.9, "page": 2},
+]
+
+
+def test_round_trip_and_page_views():
+    doc = OCRDocument.from_lines(LINES)
+    assert len(doc) == 5
+    assert doc.to_dicts() == [dict(line, confidence=float(np.float32(line["confidence"]))) for line in LINES]
+    assert doc.page_numbers == [1, 2]
+
+    page_two = doc.page(2)
+    assert list(page_two.texts()) == ["Prix unitaire €", "Total: $110.00"]
+    # Views share buffers with the parent document
+    assert np.shares_memory(page_two.boxes, doc.boxes)
+    assert page_two.text_data is doc.text_data
+
+
+def test_concat_page_views():
+    doc = OCRDocument.from_lines(LINES)
+    # Pages OCRed separately (as /scan/stream does), joined back in page order
+    joined = OCRDocument.concat([doc.page(2).slice(1, 2), OCRDocument.empty(), doc.page(1)])
+    assert list(joined.texts()) == ["Total: $110.00", "ACME CORP", "INVOICE", "Invoice No: INV-2023-001"]
+    assert joined.pages.tolist() == [2, 1, 1, 1]
+    assert joined.to_dicts()[0]["box"] == LINES[4]["box"]
+
+
+def test_merge_document_matches_merge_lines():
+    cleaner = TextCleaner()
+    doc = OCRDocument.from_lines(LINES)
+    assert cleaner.merge_lines(doc) == cleaner.merge_lines(LINES)
+    assert [len(r) for r in doc.rows()] == [2, 1, 1, 1]
+
+
+def test_save_and_memory_map():
+    doc = OCRDocument.from_lines(LINES).page(2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "doc.ocr")
+        doc.save(path)
+        loaded = OCRDocument.load(path)
+
+        assert list(loaded.texts()) == list(doc.texts())
+        assert np.array_equal(loaded.boxes, doc.boxes)
+        assert not loaded.boxes.flags.writeable
+        del loaded
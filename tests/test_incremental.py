@@ -0,0 +1,114 @@
+import sys
+import os
+import asyncio
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.pipeline.incremental import IncrementalScan
+from app.preprocessing.cleaner import TextCleaner
+from app.extractors.vendor import VendorExtractor
+from app.extractors.invoice_number import InvoiceNumberExtractor
+from app.extractors.dates import DateExtractor
+from app.extractors.currency import CurrencyExtractor
+from app.extractors.totals import TotalsExtractor
+from app.extractors.line_items import LineItemExtractor
+
+
+def line(text, y, page):
+    return {"text": text, "box": [[10, y], [300, y], [300, y + 20], [10, y + 20]], "confidence": 0.95, "page": page}
+
+
+PAGES = {
+    1: [line("ACME CORP", 10, 1), line("Invoice No: INV-7", 40, 1), line("Date: 2023-10-25", 70, 1)],
+    2: [line("Widget A 100.00", 10, 2)],
+    3: [line("Widget B 200.00", 10, 3)],
+    4: [line("Subtotal: $300.00", 400, 4), line("Tax: $30.00", 430, 4), line("Total: $330.00", 460, 4)],
+}
+
+
+def make_scan():
+    extractors = {
+        "vendor_name": VendorExtractor(),
+        "invoice_number": InvoiceNumberExtractor(),
+        "invoice_date": DateExtractor(),
+        "currency": CurrencyExtractor(),
+        "totals": TotalsExtractor(),
+        "line_items": LineItemExtractor(),
+    }
+    return IncrementalScan(TextCleaner(), extractors)
+
+
+def run(scan, pages, line_items=False):
+    requested = []
+
+    async def read_pages(numbers):
+        requested.append(numbers)
+        return [l for n in numbers for l in pages[n]]
+
+    async def collect():
+        return [event async for event in scan.run(read_pages, len(pages), line_items=line_items)]
+
+    return asyncio.run(collect()), requested
+
+
+def test_header_then_totals_without_middle_pages():
+    scan = make_scan()
+    events, requested = run(scan, PAGES)
+
+    assert requested == [[1], [4]]
+    assert [e["event"] for e in events] == ["header", "totals"]
+
+    header = events[0]["fields"]
+    assert header["invoice_number"] == "INV-7"
+    assert header["invoice_date"] == "2023-10-25"
+    assert header["total"] is None
+    assert events[1]["fields"]["total"] == 330.0
+    assert events[1]["missing"] == []
+    assert not scan.complete
+
+
+def test_middle_pages_read_for_line_items_and_missing_fields():
+    events, requested = run(make_scan(), PAGES, line_items=True)
+    assert requested == [[1], [4], [2], [3]]
+    assert [e["event"] for e in events] == ["header", "totals", "page", "page"]
+
+    # Total only on a middle page: keep reading until it turns up
+    pages = dict(PAGES)
+    pages[2] = PAGES[2] + [line("Total: $330.00", 200, 2)]
+    pages[4] = [line("Thank you for your business", 10, 4)]
+    scan = make_scan()
+    events, requested = run(scan, pages)
+    assert requested == [[1], [4], [2]]
+    assert scan.data["total"] == 330.0
+    assert scan.merged_lines[0] == "ACME CORP"
+
+
+def test_read_remaining_completes_the_document_for_storage():
+    scan = make_scan()
+    events, requested = run(scan, PAGES)
+    fields = dict(scan.data)
+
+    async def read_pages(numbers):
+        requested.append(numbers)
+        return [l for n in numbers for l in PAGES[n]]
+
+    asyncio.run(scan.read_remaining(read_pages))
+    assert requested == [[1], [4], [2, 3]]
+    assert scan.complete
+    assert scan.merged_lines.index("Widget A 100.00") < scan.merged_lines.index("Widget B 200.00")
+    assert {f: scan.data[f] for f in fields if f != "line_items"} == {f: v for f, v in fields.items() if f != "line_items"}
+
+
+def test_currency_reranked_once_totals_are_known():
+    pages = {
+        1: [line("ACME CORP", 10, 1), line("Invoice No: INV-7", 40, 1), line("Shipping insured GBP 5.00", 70, 1)],
+        2: [line("Subtotal: 300.00", 400, 2), line("Tax: 30.00", 430, 2), line("Total: 330.00 EUR", 460, 2)],
+    }
+    scan = make_scan()
+    events, _ = run(scan, pages)
+
+    # Page 1 alone suggests GBP; the total on the last page settles it, as /scan would
+    assert events[0]["fields"]["currency"] == "GBP"
+    assert events[1]["fields"]["currency"] == "EUR"
+    merged = [l for n in pages for l in TextCleaner().merge_lines(pages[n])]
+    assert scan.data["currency"] == CurrencyExtractor().extract(merged, amounts=[300.0, 30.0, 330.0])
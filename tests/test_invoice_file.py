@@ -12,6 +12,7 @@ sys.modules["pdf2image"] = MagicMock()
 sys.path.append(os.getcwd())
 
 from app.main import app, ocr_engine
+from app.ocr.document import OCRDocument
 
 client = TestClient(app)
 
@@ -26,7 +27,7 @@ MOCK_OCR_RESULT = [
 
 def test_provided_invoice_file():
     # Patch OCR engine
-    ocr_engine.process_file = MagicMock(return_value=MOCK_OCR_RESULT)
+    ocr_engine.process_document = MagicMock(return_value=OCRDocument.from_lines(MOCK_OCR_RESULT))
     
     file_path = "invoice.jpg"
     if not os.path.exists(file_path):
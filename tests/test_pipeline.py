@@ -6,6 +6,10 @@ sys.path.append(os.getcwd())
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock
 import json
+import io
+import uuid
+import asyncio
+import tracemalloc
 
 # MOCK PaddleOCR modules BEFORE importing app.main
 # This prevents the ImportError from scipy/paddlex in this environment
@@ -13,7 +17,8 @@ sys.modules["paddleocr"] = MagicMock()
 sys.modules["paddlepaddle"] = MagicMock()
 sys.modules["pdf2image"] = MagicMock()
 
-from app.main import app, ocr_engine
+from app.main import app, ocr_engine, profile_requested, profiler, scan_invoice_stream
+from app.ocr.document import OCRDocument
 
 
 client = TestClient(app)
@@ -45,7 +50,7 @@ MOCK_OCR_RESULT = [
 
 def test_scan_endpoint():
     # Patch OCR engine
-    ocr_engine.process_file = MagicMock(return_value=MOCK_OCR_RESULT)
+    ocr_engine.process_document = MagicMock(return_value=OCRDocument.from_lines(MOCK_OCR_RESULT))
     
     # Create dummy file
     dummy_file = {"file": ("test_invoice.pdf", b"dummy pdf content", "application/pdf")}
@@ -71,5 +76,47 @@ def test_scan_endpoint():
     assert data["validation_status"] == "VALID"
     print("SUCCESS: All assertions passed.")
 
+
+def test_profile_header_needs_admin_token(monkeypatch):
+    # No ADMIN_TOKEN configured: closed, not open
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert not profile_requested("1", None)
+    assert client.get("/admin/scans/slowest").status_code == 403
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert not profile_requested("1", None)
+    assert not profile_requested("1", "guess")
+    assert profile_requested("1", "secret")
+    assert not profile_requested(None, "secret")
+    assert client.get("/admin/scans/slowest", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+
+def test_stream_closed_by_client_still_finishes_profile(monkeypatch, tmp_path):
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "directory", str(tmp_path))
+    monkeypatch.setattr(ocr_engine, "page_count", lambda content, filename: 2)
+    monkeypatch.setattr(ocr_engine, "process_document", lambda content, filename, pages=None: OCRDocument.from_lines(
+        [dict(l, page=page) for page in pages for l in MOCK_OCR_RESULT]
+    ))
+
+    async def disconnect_after_header():
+        for _ in range(3):
+            upload = UploadFile(io.BytesIO(uuid.uuid4().bytes), filename="early.png", headers=Headers({"content-type": "image/png"}))
+            response = await scan_invoice_stream(
+                file=upload, line_items=False, x_api_key=None, x_scan_priority="interactive", x_profile="1", x_admin_token="secret"
+            )
+            assert json.loads(await response.body_iterator.__anext__())["event"] == "header"
+            await response.body_iterator.aclose()
+
+    asyncio.run(disconnect_after_header())
+    assert profiler._active == 0
+    assert not tracemalloc.is_tracing()
+    assert profiler.recent[-1]["error"] == "cancelled"
+
+
 if __name__ == "__main__":
     test_scan_endpoint()
+
@@ -0,0 +1,72 @@
+import sys
+import os
+import time
+import tempfile
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.profiling.profiler import Profiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    data = []
+    while time.perf_counter() < end:
+        data.append("x" * 100)
+    return data
+
+
+def test_profiled_scan_stores_artifacts():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = Profiler(directory=tmp, sample_rate=0.0, interval=0.001)
+        profile = profiler.begin("invoice.pdf", requested=True)
+
+        with profile.stage("extract"):
+            busy(0.05)
+        profile.record("queue_wait", 0.01)
+        profiler.finish(profile, invoice_id=42)
+
+        artifact = profiler.load(profile.job_id)
+        assert artifact["invoice_id"] == 42
+        assert [s["name"] for s in artifact["stages"]] == ["extract", "queue_wait"]
+        assert artifact["stages"][0]["memory"]["peak_kb"] > 0
+        assert artifact["samples"] > 0
+        assert "busy (test_profiling.py" in profiler.load_folded(profile.job_id)
+        assert profiler.job_for_invoice(42) == profile.job_id
+
+
+def test_unsampled_scans_only_keep_timings():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = Profiler(directory=tmp, sample_rate=0.0)
+        for seconds in [0.001, 0.03, 0.01]:
+            profile = profiler.begin("invoice.pdf")
+            with profile.stage("ocr"):
+                time.sleep(seconds)
+            profiler.finish(profile)
+
+        assert os.listdir(tmp) == []
+        slowest = profiler.slowest(2)
+        assert [s["stages"][0]["seconds"] >= 0.01 for s in slowest] == [True, True]
+        assert slowest[0]["total_seconds"] >= slowest[1]["total_seconds"]
+
+
+def test_profiling_is_capped_and_old_artifacts_are_pruned():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = Profiler(directory=tmp, sample_rate=0.0, max_active=1, retention=2)
+
+        first = profiler.begin("a.pdf", requested=True)
+        second = profiler.begin("b.pdf", requested=True)
+        assert first.sampled and not second.sampled
+        profiler.finish(second)
+        profiler.finish(first, invoice_id=0)
+
+        jobs = [first.job_id]
+        for invoice_id in range(1, 5):
+            profile = profiler.begin("c.pdf", requested=True)
+            profiler.finish(profile, invoice_id=invoice_id)
+            jobs.append(profile.job_id)
+
+        # Five saves: the fifth pushes the index past 2 * retention and compacts it to the newest two
+        assert profiler.load(jobs[0]) is None and profiler.job_for_invoice(0) is None
+        assert [profiler.job_for_invoice(i) for i in (3, 4)] == jobs[3:]
+        assert sorted(os.listdir(tmp)) == sorted([f"{job}.{ext}" for job in jobs[3:] for ext in ("json", "folded")] + ["index.jsonl"])
@@ -0,0 +1,82 @@
+import sys
+import os
+import tempfile
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import models
+from app.search.index import SQLiteFTS5Backend, LikeSearchBackend, save_invoice_text
+
+INVOICES = [
+    ("ACME CORP", "USD", 110.0, ["ACME CORP", "Invoice No: INV-1", "PO 4471", "Widget A SKU-99812 100.00", "Total: $110.00"]),
+    ("GLOBEX", "EUR", 80.0, ["GLOBEX", "Invoice No: G-7", "Reference PO 4471", "Total: 80.00 EUR"]),
+    ("ACME CORP", "USD", 42.0, ["ACME CORP", "Invoice No: INV-2", "PO 5000", "Total: $42.00"]),
+    # Near miss: every term of "INV-2023-001" / "PO 4471" is present, but not as that phrase
+    ("INITECH", "USD", 55.0, ["INITECH", "Invoice No: INV-2023-555", "PO 5000 item 4471 qty 001 date 2023", "Total: $55.00"]),
+]
+
+
+def make_session(tmp, backend):
+    engine = create_engine(f"sqlite:///{tmp}/search.db")
+    models.Base.metadata.create_all(bind=engine)
+    backend.setup(engine)
+    session = sessionmaker(bind=engine)()
+    for n, (vendor, currency, total, lines) in enumerate(INVOICES):
+        invoice = models.Invoice(filename=f"{n}.pdf", text_hash=str(n), vendor_name=vendor, currency=currency, total=total, validation_status="VALID")
+        session.add(invoice)
+        session.flush()
+        save_invoice_text(session, invoice.id, lines)
+    session.commit()
+    return session
+
+
+def test_fts5_search_ranks_filters_and_stays_in_sync():
+    backend = SQLiteFTS5Backend()
+    with tempfile.TemporaryDirectory() as tmp:
+        session = make_session(tmp, backend)
+
+        hits = backend.search(session, '"PO 4471"')
+        assert sorted(h["vendor_name"] for h in hits) == ["ACME CORP", "GLOBEX"]
+        assert all("[PO 4471]" in h["snippet"] for h in hits)
+
+        hits = backend.search(session, '"po 4471"', {"currency": "EUR"})
+        assert [h["vendor_name"] for h in hits] == ["GLOBEX"]
+
+        assert [h["total"] for h in backend.search(session, "SKU-99812")] == [110.0]
+
+        # Re-extraction replaces the text; the index follows
+        save_invoice_text(session, 1, ["ACME CORP", "PO 9999"])
+        session.commit()
+        assert sorted(h["id"] for h in backend.search(session, "4471")) == [2, 4]
+        assert [h["id"] for h in backend.search(session, "9999")] == [1]
+        session.close()
+
+
+def test_like_backend_matches_phrase():
+    backend = LikeSearchBackend()
+    with tempfile.TemporaryDirectory() as tmp:
+        session = make_session(tmp, backend)
+        hits = backend.search(session, '"po 4471"', {"min_total": 100})
+        assert [h["id"] for h in hits] == [1]
+        assert "4471" in hits[0]["snippet"]
+        assert [h["id"] for h in backend.search(session, '"PO 4471"')] == [2, 1]
+        assert [h["id"] for h in backend.search(session, '"PO 4471"', offset=1)] == [1]
+        session.close()
+
+
+def test_phrase_does_not_match_scattered_terms():
+    for backend in (SQLiteFTS5Backend(), LikeSearchBackend()):
+        with tempfile.TemporaryDirectory() as tmp:
+            session = make_session(tmp, backend)
+            assert backend.search(session, "INV-2023-001") == []
+            assert sorted(h["id"] for h in backend.search(session, '"PO 4471"')) == [1, 2]
+            assert [h["id"] for h in backend.search(session, "INV-2023-555")] == [4]
+            # Separate words only need to be present, in any order
+            assert sorted(h["id"] for h in backend.search(session, "PO 4471")) == [1, 2, 4]
+            assert [h["id"] for h in backend.search(session, "4471 initech")] == [4]
+            assert [h["id"] for h in backend.search(session, "acme SKU-99812")] == [1]
+            assert backend.search(session, "acme 5000 4471") == []
+            session.close()
@@ -0,0 +1,18 @@
+import sys
+import os
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.server import recommend_config
+
+
+def test_recommend_config_fills_cores():
+    for cores in [1, 2, 4, 8, 16, 64]:
+        workers, threads = recommend_config(cores)
+        assert workers >= 1 and 1 <= threads <= 2
+        assert workers * threads <= cores
+        assert workers * threads >= cores - threads
+    # Many narrow workers, not a few wide ones
+    assert recommend_config(16) == (8, 2)
+    assert recommend_config(64) == (32, 2)
+    assert recommend_config(2) == (2, 1)
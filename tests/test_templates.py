@@ -0,0 +1,124 @@
+import sys
+import os
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import models
+from app.templates.store import TemplateStore
+from app.templates.learner import TemplateLearner
+
+
+def make_invoice(number, date, subtotal, tax, total, y_shift=0):
+    return [
+        {"text": "ACME CORP", "box": [[10, 10], [100, 10], [100, 30], [10, 30]], "confidence": 0.99, "page": 1},
+        {"text": f"Ref: {number}", "box": [[200, 40 + y_shift], [350, 40 + y_shift], [350, 60 + y_shift], [200, 60 + y_shift]], "confidence": 0.95, "page": 1},
+        {"text": f"Issued {date}", "box": [[200, 70 + y_shift], [350, 70 + y_shift], [350, 90 + y_shift], [200, 90 + y_shift]], "confidence": 0.95, "page": 1},
+        {"text": "Widget A", "box": [[10, 230], [100, 230], [100, 250], [10, 250]], "confidence": 0.9, "page": 1},
+        {"text": f"{subtotal:.2f}", "box": [[300, 230], [350, 230], [350, 250], [300, 250]], "confidence": 0.9, "page": 1},
+        {"text": "Net", "box": [[250, 400], [290, 400], [290, 420], [250, 420]], "confidence": 0.9, "page": 1},
+        {"text": f"${subtotal:.2f}", "box": [[300, 400], [350, 400], [350, 420], [300, 420]], "confidence": 0.9, "page": 1},
+        {"text": f"Tax (10%): ${tax:.2f}", "box": [[250, 430], [350, 430], [350, 450], [250, 450]], "confidence": 0.9, "page": 1},
+        {"text": f"Grand Total: ${total:.2f}", "box": [[250, 460], [350, 460], [350, 480], [250, 480]], "confidence": 0.9, "page": 1},
+    ]
+
+
+def test_learn_and_apply_template():
+    engine = create_engine("sqlite:///:memory:")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    store = TemplateStore(capacity=2, min_samples=2)
+    learner = TemplateLearner()
+
+    for number, total in [("A-100", 110.0), ("A-101", 220.0)]:
+        subtotal = round(total / 1.1, 2)
+        data = {
+            "invoice_number": number,
+            "invoice_date": "2023-10-25",
+            "subtotal": subtotal,
+            "tax": round(total - subtotal, 2),
+            "total": total,
+        }
+        assert learner.learn(session, "ACME CORP", make_invoice(number, "2023-10-25", data["subtotal"], data["tax"], total), data, 0.95)
+        session.commit()
+        store.invalidate("ACME CORP")
+
+    template = store.get(session, "ACME CORP")
+    assert template is not None
+
+    result = template.apply(make_invoice("A-777", "Nov 3, 2023", 300.0, 30.0, 330.0, y_shift=3))
+    assert result["invoice_number"] == "A-777"
+    assert result["invoice_date"] == "2023-11-03"
+    assert result["subtotal"] == 300.0
+    assert result["tax"] == 30.0
+    assert result["total"] == 330.0
+
+
+def test_low_confidence_is_not_learned():
+    engine = create_engine("sqlite:///:memory:")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    learner = TemplateLearner(min_confidence=0.9)
+    data = {"invoice_number": "A-100", "total": 110.0}
+    assert not learner.learn(session, "ACME CORP", make_invoice("A-100", "2023-10-25", 100.0, 10.0, 110.0), data, 0.5)
+    assert TemplateStore(min_samples=1).get(session, "ACME CORP") is None
+
+
+def test_store_evicts_least_recently_used():
+    engine = create_engine("sqlite:///:memory:")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    store = TemplateStore(capacity=2)
+    for vendor in ["A", "B", "C"]:
+        store.get(session, vendor)
+    assert list(store._cache) == ["B", "C"]
+
+
+def test_store_rechecks_database_after_ttl():
+    engine = create_engine("sqlite:///:memory:")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    store = TemplateStore(min_samples=1, ttl=0.0)
+    assert store.get(session, "ACME CORP") is None
+
+    # Learned by another worker: no invalidate() reaches this store, the expired miss is re-read
+    data = {"invoice_number": "A-100", "total": 110.0}
+    TemplateLearner().learn(session, "ACME CORP", make_invoice("A-100", "2023-10-25", 100.0, 10.0, 110.0), data, 0.95)
+    session.commit()
+    assert store.get(session, "ACME CORP") is not None
+
+
+def test_concurrent_first_insert_keeps_invoice():
+    engine = create_engine("sqlite:///:memory:")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    # Another worker's template for the vendor lands between our lookup and our insert
+    session.add(models.VendorTemplate(vendor_name="ACME CORP", fields={}, samples=3))
+    session.commit()
+    session.add(models.Invoice(filename="a.pdf", text_hash="a", vendor_name="ACME CORP"))
+    session.flush()
+
+    learner = TemplateLearner()
+    real_find = learner._find
+    calls = []
+
+    def stale_find(s, vendor):
+        calls.append(vendor)
+        return None if len(calls) == 1 else real_find(s, vendor)
+
+    learner._find = stale_find
+
+    data = {"invoice_number": "A-100", "total": 110.0}
+    assert learner.learn(session, "ACME CORP", make_invoice("A-100", "2023-10-25", 100.0, 10.0, 110.0), data, 0.95)
+    session.commit()
+
+    assert len(calls) == 2
+    assert session.query(models.Invoice).count() == 1
+    assert session.query(models.VendorTemplate).one().samples == 4
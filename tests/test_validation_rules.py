@@ -0,0 +1,121 @@
+import sys
+import os
+import tempfile
+from datetime import date
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import models
+from app.events.outbox import VALIDATION_CHANGED
+from app.validation.rules import RuleEngine, RuleContext
+from app.validation.bulk import BulkValidator
+from app.validation.validator import Validator
+
+TODAY = date(2024, 6, 1)
+
+
+def invoice(n, **overrides):
+    fields = dict(
+        filename=f"{n}.pdf", text_hash=str(n), vendor_name="ACME", invoice_number=f"INV-{n}", invoice_date="2024-01-15",
+        currency="USD", subtotal=100.0, tax=10.0, total=110.0, validation_status="VALID",
+    )
+    fields.update(overrides)
+    fields.setdefault("line_items", [{"description": "Widget", "amount": fields["subtotal"]}])
+    return models.Invoice(**fields)
+
+
+def test_inline_rules_keep_validator_messages():
+    result = Validator().validate({"vendor_name": "ACME", "invoice_date": "2024-01-15", "subtotal": 100.0, "tax": 10.0, "total": 120.0})
+    assert not result["is_valid"]
+    assert result["errors"] == [
+        "Missing invoice number",
+        "Math mismatch: Subtotal (100.0) + Tax (10.0) != Total (120.0)",
+        "Missing currency",
+    ]
+
+    engine = RuleEngine.from_file("data/validation_rules.json")
+    stats = {"ACME": {"samples": 10, "mean": 110.0, "std": 5.0}}
+    data = {"vendor_name": "ACME", "invoice_number": "1", "invoice_date": "2024-06-05", "currency": "USD",
+            "subtotal": 900.0, "tax": 90.0, "total": 990.0, "line_items": [{"amount": 800.0}]}
+    result = engine.evaluate(data, RuleContext(TODAY, stats))
+    assert result["errors"] == ["Invoice date 2024-06-05 is in the future"]
+    assert result["warnings"] == [
+        "Line items (800.0) != Subtotal (900.0)",
+        "Total (990.0) outside the usual range for ACME (90.0 - 130.0)",
+    ]
+
+
+def test_bulk_validation_matches_inline_and_records_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/rules.db")
+        models.Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+
+        session = session_factory()
+        session.add_all([invoice(n, subtotal=100.0 + n % 3, total=110.0 + n % 3) for n in range(8)])
+        session.add_all([
+            invoice(8, invoice_number="INV-1"),                   # duplicate number for ACME
+            invoice(9, invoice_date="2030-01-01"),                # future date
+            invoice(10, subtotal=4990.0, total=5000.0, line_items=[{"amount": 100.0}]),  # outside ACME's range, line items off
+            invoice(11, currency=None, validation_status="PENDING"),
+        ])
+        session.commit()
+        session.close()
+
+        rules = RuleEngine.from_file("data/validation_rules.json")
+        summary = BulkValidator(session_factory, rules, chunk_size=5, today=TODAY).run()
+
+        assert summary["invoices"] == 12
+        assert summary["failures"]["duplicate_invoice_number"] == 1
+        assert summary["failures"]["future_date"] == 1
+        assert summary["failures"]["currency_present"] == 1
+        assert summary["failures"]["line_items_sum"] == 1
+
+        session = session_factory()
+        status = dict(session.query(models.Invoice.id, models.Invoice.validation_status))
+        invalid = sorted(i for i, s in status.items() if s == "INVALID")
+        # INV-1 was first stored as invoice 2; only the later copy (9) is the duplicate
+        assert invalid == [9, 10, 12]
+
+        # Changes are announced through the outbox
+        events = session.query(models.OutboxEvent).filter(models.OutboxEvent.event_type == VALIDATION_CHANGED).all()
+        assert sorted(e.invoice_id for e in events) == invalid
+        assert "Missing currency" in next(e for e in events if e.invoice_id == 12).payload["errors"]
+
+        # Bulk and inline agree on the single-invoice rules
+        stats = {v.vendor_name: {"samples": v.samples, "mean": v.mean_total, "std": v.std_total} for v in session.query(models.VendorStats)}
+        row = session.get(models.Invoice, 11)
+        inline = rules.evaluate({f: getattr(row, f) for f in ("vendor_name", "invoice_number", "invoice_date", "currency", "subtotal", "tax", "total", "line_items")}, RuleContext(TODAY, stats))
+        stored = [r.message for r in session.query(models.ValidationResult).filter_by(invoice_id=11)]
+        assert sorted(inline["errors"] + inline["warnings"]) == sorted(stored)
+
+        # Re-running replaces results instead of piling them up
+        BulkValidator(session_factory, rules, chunk_size=5, today=TODAY).run()
+        assert session.query(models.ValidationResult).count() == summary_count(summary)
+        session.close()
+
+
+def test_inline_duplicate_number_needs_a_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/rules.db")
+        models.Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add(invoice(1))
+        session.commit()
+
+        data = {"vendor_name": "ACME", "invoice_number": "INV-1", "invoice_date": "2024-01-15", "currency": "USD",
+                "subtotal": 100.0, "tax": 10.0, "total": 110.0}
+        validator = Validator()
+        result = validator.validate(data, session=session)
+        assert result["errors"] == ["Duplicate invoice number INV-1 for ACME"]
+        # Same number from another vendor, or no session to check against
+        assert validator.validate(dict(data, vendor_name="GLOBEX"), session=session)["is_valid"]
+        assert validator.validate(data)["is_valid"]
+        session.close()
+
+
+def summary_count(summary):
+    return sum(summary["failures"].values())
@@ -0,0 +1,145 @@
+import sys
+import os
+import json
+import asyncio
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import models
+from app.events.outbox import OutboxNotifier, record_event, INVOICE_CREATED
+from app.events.dispatcher import WebhookDispatcher
+
+
+class Receiver(BaseHTTPRequestHandler):
+    """Local stand-in for a webhook endpoint. Fails the first request to exercise retries."""
+    batches = []
+    requests = 0
+
+    def do_POST(self):
+        Receiver.requests += 1
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if Receiver.requests == 1:
+            self.send_response(500)
+        else:
+            Receiver.batches.append(json.loads(body)["events"])
+            self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def add_invoices(session_factory, notifier, start, count):
+    session = session_factory()
+    for n in range(start, start + count):
+        invoice = models.Invoice(filename=f"{n}.pdf", text_hash=str(n), vendor_name="ACME", total=float(n), validation_status="VALID")
+        session.add(invoice)
+        session.flush()
+        record_event(session, INVOICE_CREATED, invoice)
+    session.commit()
+    session.close()
+    notifier.notify()
+
+
+def test_dispatcher_delivers_batches_in_order_with_retry():
+    server = HTTPServer(("127.0.0.1", 0), Receiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/hook"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/events.db")
+        models.Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        notifier = OutboxNotifier()
+
+        # Events from before the endpoint was first seen are not replayed
+        add_invoices(session_factory, notifier, 0, 2)
+
+        async def scenario():
+            dispatcher = WebhookDispatcher(session_factory, [url], notifier, batch_size=3, concurrency=2, poll_interval=0.2, backoff_base=0.05)
+            dispatcher.start()
+            await asyncio.sleep(0.3)
+            await asyncio.to_thread(add_invoices, session_factory, notifier, 2, 7)
+            for _ in range(100):
+                # "delivered" only counts events the cursor has been saved past
+                if dispatcher.stats[url]["delivered"] >= 7:
+                    break
+                await asyncio.sleep(0.05)
+            await dispatcher.stop()
+            return dispatcher.stats[url]
+
+        stats = asyncio.run(scenario())
+        server.shutdown()
+
+        delivered = [e for batch in Receiver.batches for e in batch]
+        totals = [e["data"]["total"] for e in delivered]
+        # At-least-once: the failed batch is re-sent, possibly along with a batch that already went out
+        assert sorted(set(totals)) == [float(n) for n in range(2, 9)]
+        assert max(len(b) for b in Receiver.batches) <= 3
+        assert stats["failures"] >= 1
+        assert delivered[-1]["type"] == INVOICE_CREATED
+
+        session = session_factory()
+        assert session.get(models.WebhookCursor, url).last_event_id == 9
+        session.close()
+
+
+class Collector(BaseHTTPRequestHandler):
+    events = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        Collector.events.extend(json.loads(body)["events"])
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_dispatcher_delivers_events_committed_out_of_id_order():
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/hook"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/events.db")
+        models.Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        notifier = OutboxNotifier()
+
+        def add_event(event_id):
+            session = session_factory()
+            session.add(models.OutboxEvent(id=event_id, event_type=INVOICE_CREATED, invoice_id=event_id, payload={}))
+            session.commit()
+            session.close()
+            notifier.notify()
+
+        async def wait_for(ids):
+            for _ in range(100):
+                if {e["id"] for e in Collector.events} >= ids:
+                    return
+                await asyncio.sleep(0.05)
+
+        async def scenario():
+            dispatcher = WebhookDispatcher(session_factory, [url], notifier, poll_interval=0.1)
+            dispatcher.start()
+            await asyncio.sleep(0.2)
+            # Id 2 belongs to a transaction that commits after 1 and 3 (concurrent writers)
+            await asyncio.to_thread(add_event, 1)
+            await asyncio.to_thread(add_event, 3)
+            await wait_for({1, 3})
+            await asyncio.to_thread(add_event, 2)
+            await wait_for({1, 2, 3})
+            await dispatcher.stop()
+
+        asyncio.run(scenario())
+        server.shutdown()
+
+    assert sorted(e["id"] for e in Collector.events) == [1, 2, 3]